@@ -1,14 +1,12 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import plotly.graph_objects as go
-from modules.text_analyzer import analyze_text
-from modules.image_analyzer import analyze_image
-from modules.voice_analyzer import analyze_voice, transcribe_audio
-from modules.emotion_fuser import fuse_emotions
-from modules.music_orchestrator import create_music_prompt
-from modules.music_generator import generate_music
-from modules.explainer import explain_music
+from modules.voice_analyzer import transcribe_audio
+from modules.emotion_fuser import FUSED_ANALYSIS
+from modules.music_generator import MUSICGEN_STREAMING
+from modules.pipeline import run_generate
 from modules.feedback import save_feedback, get_feedback_summary, get_learned_rules
+from modules.warmup import get_readiness, start_warmup
+from utils.llm_client import get_llm_metrics
 from st_audiorec import st_audiorec
 
 st.set_page_config(page_title="Music2MyEars", page_icon="🎵", layout="centered")
@@ -432,6 +430,14 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# --- WARMUP ---
+# Load MusicGen and Whisper in the background as soon as the server starts
+start_warmup()
+readiness = get_readiness()
+if not readiness["ready"]:
+    warming = [name for name, s in readiness["components"].items() if s["state"] in ("pending", "loading")]
+    st.info(f"Warming up ({', '.join(warming)})... you can start now; the first track may take a little longer.")
+
 # --- INPUT SECTION ---
 text_input = st.text_area(
     "What's on your mind?",
@@ -481,7 +487,8 @@ with col_voice:
         st.rerun()
 
 # --- DURATION ---
-DURATION_TOKENS = {"5 sec": 250, "10 sec": 500, "20 sec": 1000}
+# Past 20 sec, music_generator builds the track from overlapping windows
+DURATION_TOKENS = {"5 sec": 250, "10 sec": 500, "20 sec": 1000, "1 min": 3000, "2 min": 6000, "5 min": 15000}
 duration = st.radio("Duration", list(DURATION_TOKENS.keys()), index=0, horizontal=True)
 
 # --- ADVANCED OPTIONS ---
@@ -495,6 +502,20 @@ with st.expander("Advanced Options", expanded=False):
     with col2:
         slider_warmth = st.slider("Warmth: Warm ↔ Bright", 0, 100, defaults.get("warmth", 50))
         slider_arc = st.slider("Arc: Steady ↔ Big Build", 0, 100, defaults.get("arc", 50))
+    fused_analysis = st.toggle(
+        "Fast analysis (one AI call for all inputs)",
+        value=FUSED_ANALYSIS,
+        help="Analyze text, image and voice together and build the emotional profile in a single request.",
+    )
+    stream_audio = st.toggle(
+        "Stream audio preview",
+        value=MUSICGEN_STREAMING,
+        help="Start playing the first variation while the rest of the track is still being generated.",
+    )
+    seed = st.number_input(
+        "Seed", min_value=0, value=None, step=1, placeholder="Any",
+        help="Same inputs and seed give the same music. Repeats are served from cache; change the seed for a fresh take.",
+    )
 
 # --- WHAT I'VE LEARNED ---
 rules = get_learned_rules()
@@ -535,53 +556,48 @@ if st.button("Generate Music", type="primary", use_container_width=True):
     image_bytes = image_file.getvalue() if has_image else None
     voice_bytes = voice_bytes_recorded if has_voice else None
 
-    # Step A: Analyze inputs in parallel
-    mood_list = []
-    with st.spinner("Analyzing your inputs..."):
-        tasks = {}
-        with ThreadPoolExecutor() as executor:
-            if has_text:
-                tasks[executor.submit(analyze_text, text_input.strip())] = "text"
-            if has_image:
-                tasks[executor.submit(analyze_image, image_bytes)] = "image"
-            if has_voice:
-                tasks[executor.submit(analyze_voice, voice_bytes)] = "voice"
-            for future in as_completed(tasks):
-                mood_list.append(future.result())
-
-    # Step B: Fuse emotions
-    with st.spinner("Building emotional profile..."):
-        ai_profile = fuse_emotions(mood_list)
-
-    st.session_state["ai_profile"] = ai_profile
-
-    # Step C: Apply slider overrides
-    final_profile = dict(ai_profile)
-    overrides = []
-    slider_vals = {"energy": slider_energy, "style": slider_style, "warmth": slider_warmth, "arc": slider_arc}
-
-    for dim, slider_val in slider_vals.items():
-        ai_val = ai_profile.get(dim, 50)
-        if slider_val != defaults.get(dim, 50):
-            final_profile[dim] = slider_val
-            overrides.append(dim)
-        else:
-            final_profile[dim] = ai_val
-
-    final_profile["overrides"] = overrides
-
-    # Step D: Orchestrate + Generate
-    with st.spinner("Composing your soundtrack..."):
-        music_prompt = create_music_prompt(final_profile)
-
-    with st.spinner("Generating music... (this takes ~20-30s)"):
-        audio_list = generate_music(music_prompt, max_new_tokens=DURATION_TOKENS[duration])
-
-    # Step E: Explain
-    with st.spinner("Writing the story of your music..."):
-        explanation = explain_music(
-            text_input or "", ai_profile, final_profile, overrides, music_prompt
+    # Streaming refreshes this player every few seconds of new audio, resuming where it left off
+    preview = st.empty()
+    preview_shown = {"seconds": None}
+
+    def show_preview(stage, payload):
+        shown = preview_shown["seconds"]
+        if shown is not None and payload["seconds"] - shown < 3:
+            return
+        with preview.container():
+            st.caption(f"Preview — {payload['seconds']:.0f}s so far, still generating...")
+            st.audio(payload["audio"], format="audio/wav", autoplay=True, start_time=int(shown or 0))
+        preview_shown["seconds"] = payload["seconds"]
+
+    # Steps A-E run as a dependency graph: independent stages overlap, e.g.
+    # the explanation is written while MusicGen renders the audio.
+    with st.status("Creating your music... (generation takes ~20-30s)", expanded=False) as status:
+        values, timings = run_generate(
+            sliders={"energy": slider_energy, "style": slider_style, "warmth": slider_warmth, "arc": slider_arc},
+            slider_defaults=defaults,
+            max_new_tokens=DURATION_TOKENS[duration],
+            seed=seed,
+            on_start=lambda stage: status.update(label=f"{stage.label}..."),
+            on_done=lambda stage, secs: st.write(f"{stage.label} — {secs:.1f}s"),
+            on_progress=show_preview if stream_audio else None,
+            text=text_input.strip() if has_text else None,
+            image_bytes=image_bytes,
+            voice_bytes=None if fused_analysis else voice_bytes,
+            transcript=st.session_state["voice_transcript"] if (fused_analysis and has_voice) else None,
+            fused=fused_analysis,
+            stream=stream_audio,
         )
+        status.update(label="Your music is ready", state="complete")
+    preview.empty()
+
+    mood_list = values["mood_list"]
+    ai_profile = values["ai_profile"]
+    final_profile = values["final_profile"]
+    overrides = values["overrides"]
+    music_prompt = values["music_prompt"]
+    audio_list = values["audio_list"]
+    explanation = values["explanation"]
+    st.session_state["ai_profile"] = ai_profile
 
     # Store everything in session state so results survive reruns
     st.session_state["music_prompt"] = music_prompt
@@ -595,7 +611,9 @@ if st.button("Generate Music", type="primary", use_container_width=True):
         "max_new_tokens": DURATION_TOKENS[duration],
         "temperature": 1.0,
         "guidance_scale": 3.0,
+        "seed": seed,
     }
+    st.session_state["stage_timings"] = timings
     st.session_state["has_results"] = True
 
 # --- RESULTS (persisted via session_state) ---
@@ -652,6 +670,21 @@ if st.session_state.get("has_results"):
     with st.expander("See the music prompt"):
         st.text_area("Prompt", music_prompt, height=150, disabled=True, label_visibility="collapsed")
 
+    timings = st.session_state.get("stage_timings")
+    if timings:
+        with st.expander("Pipeline timing"):
+            for name, t in sorted(timings.items(), key=lambda kv: kv[1]["start"]):
+                st.caption(f"{name}: started at {t['start']:.1f}s, took {t['duration']:.1f}s")
+            fusion_paths = {"local": "blended locally", "llm": "separate AI call", "fused": "single combined AI call"}
+            if ai_profile.get("fusion"):
+                st.caption(f"Emotional profile: {fusion_paths.get(ai_profile['fusion'], ai_profile['fusion'])}")
+            llm_sites = get_llm_metrics()["sites"]
+            if llm_sites:
+                st.caption("AI calls since the server started:")
+                for site, m in sorted(llm_sites.items(), key=lambda kv: -kv[1]["latency_sum"]):
+                    st.caption(f"{site}: {m['calls']} calls, avg {m['latency_avg']:.1f}s, "
+                               f"{m['cache_hits']} cached, {m['retries']} retries, {m['parse_failures']} bad JSON")
+
     # --- EXPLAINER ---
     st.divider()
     st.markdown('<div class="section-header fade-in-up">How your input became music</div>', unsafe_allow_html=True)
@@ -776,7 +809,10 @@ if st.session_state.get("has_results"):
                     f"Replay rate: {summary['replay_rate']}%"
                 )
             with col_s2:
-                if summary["reflections_completed"] > 0:
+                reflection = summary["reflection_status"]
+                if reflection["state"] == "running" or reflection["pending"]:
+                    st.caption("Learning cycle running in the background...")
+                elif summary["reflections_completed"] > 0:
                     st.caption(
                         f"Reflections: {summary['reflections_completed']} | "
                         f"Rules active: {summary['rules_active']} | "
@@ -1,5 +1,27 @@
-from utils.llm_client import ask_json
-from modules.feedback import get_learned_defaults, get_emotion_profile
+import os
+from utils.image_prep import prepare_image
+from utils.llm_client import ask_json, ask_json_with_image
+from modules.feedback import (
+    get_emotion_profile,
+    get_learned_defaults,
+    get_learned_rules,
+    get_rules_revision,
+)
+
+# Default for the one-call analyze+fuse path (the app also exposes a toggle)
+FUSED_ANALYSIS = os.getenv("FUSED_ANALYSIS", "0") == "1"
+# fuse_emotions skips the LLM when the local blend is at least this confident (>1 disables)
+FUSE_LOCAL_MIN_CONFIDENCE = float(os.getenv("FUSE_LOCAL_MIN_CONFIDENCE", "0.75"))
+
+SLIDER_KEYS = ["energy", "style", "warmth", "arc"]
+
+_SLIDER_RULES = """Rules:
+- Blend ALL detected emotions into the slider values, not just the dominant one
+- "sad but hopeful" → moderate energy (hope lifts it), warm style, gentle build arc
+- "angry and frustrated" → high energy, bright/harsh warmth, big build
+- "peaceful and grateful" → low energy, warm, steady arc
+- The slider values should reflect the MIX of emotions, not just the dominant one
+- Base values on the actual emotional content, not random guesses"""
 
 
 def _range_clamp(ai_value, learned_range):
@@ -16,10 +38,133 @@ def _range_clamp(ai_value, learned_range):
     return round(ai_value * 0.3 + nearest * 0.7)
 
 
+# --- Local Fusion ---
+#
+# Slider values (energy, style, warmth, arc) for common emotion words. Learned
+# emotion profiles override these with the midpoints of their preferred ranges.
+_EMOTION_SLIDERS = {
+    "happy": (70, 50, 80, 50),
+    "joyful": (75, 55, 85, 55),
+    "excited": (85, 65, 80, 75),
+    "energetic": (90, 60, 70, 65),
+    "playful": (65, 35, 85, 40),
+    "grateful": (35, 45, 75, 35),
+    "hopeful": (50, 55, 70, 60),
+    "confident": (70, 60, 65, 55),
+    "romantic": (40, 50, 70, 45),
+    "love": (40, 50, 75, 45),
+    "peaceful": (15, 30, 65, 15),
+    "calm": (20, 25, 60, 15),
+    "relaxed": (20, 25, 65, 15),
+    "content": (30, 30, 65, 20),
+    "dreamy": (25, 45, 55, 30),
+    "nostalgic": (35, 45, 45, 40),
+    "melancholic": (25, 45, 25, 35),
+    "sad": (20, 35, 20, 30),
+    "lonely": (20, 25, 20, 25),
+    "tired": (10, 20, 35, 10),
+    "bored": (15, 15, 40, 10),
+    "anxious": (65, 45, 30, 60),
+    "fearful": (60, 60, 15, 70),
+    "tense": (70, 55, 25, 70),
+    "frustrated": (75, 50, 35, 65),
+    "angry": (90, 70, 30, 85),
+    "awe": (45, 85, 55, 75),
+    "epic": (85, 95, 60, 90),
+    "mysterious": (35, 55, 20, 50),
+    "dark": (50, 60, 10, 55),
+    "neutral": (50, 50, 50, 50),
+}
+_MOOD_RANK_WEIGHTS = [1.0, 0.5, 0.25]  # Weight of a source's 1st, 2nd, 3rd mood
+_slider_table = (None, None)  # (rules revision, {emotion: {slider: value}})
+
+
+def _get_slider_table():
+    """Return the emotion -> sliders lookup, rebuilt when the learned rules change."""
+    global _slider_table
+    revision = get_rules_revision()
+    cached_revision, table = _slider_table
+    if table is not None and cached_revision == revision:
+        return table
+
+    table = {emotion: dict(zip(SLIDER_KEYS, values)) for emotion, values in _EMOTION_SLIDERS.items()}
+    for emotion, profile in get_learned_rules().get("emotion_profiles", {}).items():
+        pref = profile.get("preferred_params", {})
+        entry = dict(table.get(emotion.lower(), {}))
+        for key in SLIDER_KEYS:
+            bounds = pref.get(f"{key}_range")
+            if isinstance(bounds, (list, tuple)) and len(bounds) == 2:
+                entry[key] = (bounds[0] + bounds[1]) / 2
+        if len(entry) == len(SLIDER_KEYS):
+            table[emotion.lower()] = entry
+    _slider_table = (revision, table)
+    return table
+
+
+def _local_fusion(mood_list):
+    """Blend mood signals into an ai_profile without an LLM call.
+
+    Each source's moods are looked up in the slider table, weighted by rank
+    (dominant first), and averaged; the sources' own energy readings are mixed
+    into energy. Returns (profile, confidence) where confidence (0-1) drops
+    with unknown mood words and with emotions that pull the sliders apart
+    (e.g. "sad" + "excited"). Returns (None, 0.0) if nothing is recognized.
+    """
+    table = _get_slider_table()
+    weights = {}
+    total_weight = 0.0
+    measured_energy = []
+    for mood in mood_list:
+        words = mood.get("moods") or [mood.get("mood")]
+        for rank, word in enumerate(w for w in words[:len(_MOOD_RANK_WEIGHTS)] if w):
+            word = str(word).strip().lower()
+            weight = _MOOD_RANK_WEIGHTS[rank]
+            total_weight += weight
+            if word in table:
+                weights[word] = weights.get(word, 0.0) + weight
+        energy = mood.get("energy")
+        if isinstance(energy, (int, float)) and 0 <= energy <= 1:
+            measured_energy.append(energy * 100)
+
+    known_weight = sum(weights.values())
+    if not known_weight:
+        return None, 0.0
+
+    profile = {}
+    spread = 0.0
+    for key in SLIDER_KEYS:
+        value = sum(table[word][key] * w for word, w in weights.items()) / known_weight
+        spread += sum(abs(table[word][key] - value) * w for word, w in weights.items()) / known_weight
+        profile[key] = value
+    if measured_energy:
+        profile["energy"] = 0.5 * profile["energy"] + 0.5 * sum(measured_energy) / len(measured_energy)
+    for key in SLIDER_KEYS:
+        profile[key] = int(round(min(100, max(0, profile[key]))))
+
+    ranked = sorted(weights, key=weights.get, reverse=True)
+    profile["emotions"] = ranked[:3]
+    profile["emotion"] = ranked[0]
+
+    # Mean absolute deviation per slider is 0 when all emotions agree; 40+ is a real conflict
+    agreement = max(0.0, 1 - spread / len(SLIDER_KEYS) / 40)
+    confidence = (known_weight / total_weight) * agreement
+    return profile, round(confidence, 3)
+
+
 def fuse_emotions(mood_list):
-    """Merge mood signals into one ai_profile with 4 slider dimensions."""
+    """Merge mood signals into one ai_profile with 4 slider dimensions.
+
+    Confident blends of known emotions are fused locally; ambiguous or
+    unfamiliar mixes go to the LLM.
+    """
     sources = [m.get("source", "unknown") for m in mood_list]
 
+    local, confidence = _local_fusion(mood_list)
+    if local is not None and confidence >= FUSE_LOCAL_MIN_CONFIDENCE:
+        local["sources"] = sources
+        local["fusion"] = "local"
+        return _apply_learned_knowledge(local)
+
     mood_descriptions = "\n".join(
         f"- Source: {m.get('source')}, Moods: {m.get('moods', [m.get('mood')])}, Energy: {m.get('energy')}"
         for m in mood_list
@@ -40,19 +185,18 @@ Produce ONE unified emotional profile as JSON:
   "arc": <0-100 integer, 0=steady constant, 100=big dramatic build>
 }}
 
-Rules:
-- Blend ALL detected emotions into the slider values, not just the dominant one
-- "sad but hopeful" → moderate energy (hope lifts it), warm style, gentle build arc
-- "angry and frustrated" → high energy, bright/harsh warmth, big build
-- "peaceful and grateful" → low energy, warm, steady arc
-- The slider values should reflect the MIX of emotions, not just the dominant one
-- Base values on the actual emotional content, not random guesses
+{_SLIDER_RULES}
 
 Return ONLY the JSON object."""
 
     result = ask_json(prompt)
     result["sources"] = sources
+    result["fusion"] = "llm"
+    return _apply_learned_knowledge(result)
 
+
+def _apply_learned_knowledge(result):
+    """Range-clamp (or average) the AI's slider values using learned profiles."""
     # Apply learned knowledge — range-clamping instead of blind overwrite
     emotion = result.get("emotion", "")
     emo_profile = get_emotion_profile(emotion)
@@ -60,7 +204,7 @@ Return ONLY the JSON object."""
     if emo_profile:
         # Use range-clamping: keep AI value if in range, nudge if outside
         pref = emo_profile.get("preferred_params", {})
-        for key in ["energy", "style", "warmth", "arc"]:
+        for key in SLIDER_KEYS:
             range_key = f"{key}_range"
             if range_key in pref and key in result:
                 result[key] = _range_clamp(result[key], pref[range_key])
@@ -68,8 +212,96 @@ Return ONLY the JSON object."""
         # Fallback: simple averaging with learned defaults
         learned = get_learned_defaults(emotion)
         if learned:
-            for key in ["energy", "style", "warmth", "arc"]:
+            for key in SLIDER_KEYS:
                 if key in learned and key in result:
                     result[key] = round((result[key] + learned[key]) / 2)
 
     return result
+
+
+def analyze_and_fuse(text=None, image_bytes=None, transcript=None):
+    """Analyze all inputs and fuse them in a single LLM call.
+
+    Replaces separate analyze_text/analyze_image/analyze_voice calls followed
+    by fuse_emotions. Returns (mood_list, ai_profile) in the same shapes those
+    functions produce, with ai_profile["fusion"] = "fused". Voice must
+    already be transcribed.
+    """
+    # An empty transcript is neutral, as in analyze_voice — no need to send it
+    silent_voice = None
+    if transcript is not None and not transcript.strip():
+        silent_voice = {"transcript": "", "moods": ["neutral"], "mood": "neutral",
+                        "energy": 0.5, "source": "voice"}
+        transcript = None
+
+    sources = []
+    blocks = []
+    if text:
+        sources.append("text")
+        blocks.append(f'Text the user wrote: "{text}"')
+    if image_bytes is not None:
+        sources.append("image")
+        blocks.append("Image the user uploaded: attached")
+    if transcript is not None:
+        sources.append("voice")
+        blocks.append(f'Transcript of what the user said: "{transcript}"')
+    if not sources:
+        if silent_voice:
+            return [silent_voice], fuse_emotions([silent_voice])
+        raise ValueError("analyze_and_fuse needs at least one input")
+
+    source_schema = {
+        "text": '"text": {"summary": "<one sentence summary>", "moods": ["<1-3 emotion words>"], "mood": "<dominant>", "energy": <0.0-1.0>}',
+        "image": '"image": {"caption": "<one sentence describing the image>", "moods": ["<1-3 emotion words>"], "mood": "<dominant>", "energy": <0.0-1.0>}',
+        "voice": '"voice": {"moods": ["<1-3 emotion words>"], "mood": "<dominant>", "energy": <0.0-1.0>}',
+    }
+    per_source = ",\n    ".join(source_schema[s] for s in sources)
+
+    prompt = f"""You are a multimodal emotion analyst for a music generation system.
+
+Inputs provided: {", ".join(sources)}
+{chr(10).join(blocks)}
+
+First read each input on its own, then produce ONE unified emotional profile.
+Return JSON:
+{{
+  "per_source": {{
+    {per_source}
+  }},
+  "emotions": ["<list of 1-3 detected emotions across all inputs, most dominant first>"],
+  "emotion": "<single most dominant emotion>",
+  "energy": <0-100 integer>,
+  "style": <0-100 integer, 0=minimal sparse, 100=cinematic epic>,
+  "warmth": <0-100 integer, 0=deep dark moody, 100=bright sparkling>,
+  "arc": <0-100 integer, 0=steady constant, 100=big dramatic build>
+}}
+
+{_SLIDER_RULES}
+
+Return ONLY the JSON object."""
+
+    if image_bytes is not None:
+        image_bytes, _ = prepare_image(image_bytes)
+        result = ask_json_with_image(prompt, image_bytes)
+    else:
+        result = ask_json(prompt)
+
+    per_source_result = result.pop("per_source", {}) or {}
+    mood_list = []
+    for source in sources:
+        mood = dict(per_source_result.get(source) or {})
+        moods = mood.get("moods") or [mood.get("mood") or result.get("emotion", "neutral")]
+        mood["moods"] = moods
+        mood.setdefault("mood", moods[0])
+        mood.setdefault("energy", 0.5)
+        if source == "voice":
+            mood["transcript"] = transcript
+        mood["source"] = source
+        mood_list.append(mood)
+    if silent_voice:
+        mood_list.append(silent_voice)
+        sources.append("voice")
+
+    result["sources"] = sources
+    result["fusion"] = "fused"
+    return mood_list, _apply_learned_knowledge(result)
@@ -1,15 +1,32 @@
+import asyncio
+import copy
 import json
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from utils.llm_client import ask_json
-
-FEEDBACK_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "feedback.json")
+from itertools import zip_longest
+import numpy as np
+from utils.file_io import atomic_write_json, atomic_write_text, file_lock
+from utils.llm_client import ask_json_async
+
+FEEDBACK_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "feedback.jsonl")
+FEEDBACK_INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "feedback.idx.json")
+LEGACY_FEEDBACK_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "feedback.json")
 LEARNED_RULES_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "learned_rules.json")
+REFLECTION_LOCK_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "reflection")
 
 REFLECTION_THRESHOLD = 5  # Run reflection every N new ratings
+REFLECTION_MAX_CONCURRENCY = int(os.getenv("REFLECTION_MAX_CONCURRENCY", "4"))  # Max in-flight Gemini calls
+REFLECTION_TOKEN_BUDGET = int(os.getenv("REFLECTION_TOKEN_BUDGET", "4000"))  # Per-prompt budget for entry listings
+
+SLIDER_KEYS = ["energy", "style", "warmth", "arc"]
+_PARAM_DEFAULTS = {"temperature": 1.0, "guidance_scale": 3.0, "max_new_tokens": 256}
 
 _DEFAULT_RULES = {
     "version": 1,
+    "revision": 0,
     "last_reflection": None,
     "reflection_count": 0,
     "entries_analyzed": 0,
@@ -25,45 +42,337 @@ _DEFAULT_RULES = {
 
 
 # --- Feedback I/O ---
+#
+# Feedback lives in an append-only JSON Lines log (one entry per line) so a
+# new rating costs one small write instead of re-serializing the full history.
+# A sidecar index records the entry count and the log size it was taken at,
+# so the count is available without parsing the log.
+#
+# Several app processes may share data/, so every write holds an advisory
+# lock on feedback.jsonl.lock, and full rewrites go through a temp file and
+# rename. The lock is not re-entrant: only the top-level writers take it.
+
+def _write_feedback_index(count, size):
+    """Record the entry count for a log of the given byte size."""
+    atomic_write_json(FEEDBACK_INDEX_PATH, {"count": count, "size": size})
+
+
+def _read_feedback_index():
+    """Return the sidecar index dict, or None if missing or unreadable."""
+    path = os.path.abspath(FEEDBACK_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _migrate_legacy_feedback():
+    """One-time conversion of the old feedback.json array into the JSONL log.
+
+    The original file is kept alongside as feedback.json.bak.
+    """
+    legacy = os.path.abspath(LEGACY_FEEDBACK_PATH)
+    path = os.path.abspath(FEEDBACK_PATH)
+    if os.path.exists(path) or not os.path.exists(legacy):
+        return
+    with file_lock(path):
+        if os.path.exists(path) or not os.path.exists(legacy):
+            return  # Another process migrated while we waited
+        with open(legacy, "r") as f:
+            entries = json.load(f)
+        _write_feedback_log(entries)
+        os.replace(legacy, legacy + ".bak")
+
 
 def _load_feedback():
     """Load all feedback entries from disk."""
+    _migrate_legacy_feedback()
     path = os.path.abspath(FEEDBACK_PATH)
     if not os.path.exists(path):
         return []
+    entries = []
     with open(path, "r") as f:
-        return json.load(f)
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # Skip a torn trailing line from an interrupted write
+    return entries
+
+
+def _write_feedback_log(entries):
+    """Atomically replace the log and its index. Caller must hold the lock."""
+    path = os.path.abspath(FEEDBACK_PATH)
+    atomic_write_text(path, "".join(json.dumps(entry) + "\n" for entry in entries))
+    _write_feedback_index(len(entries), os.path.getsize(path))
 
 
 def _save_feedback(entries):
-    """Write all feedback entries to disk."""
+    """Write all feedback entries to disk, replacing the existing log."""
+    _migrate_legacy_feedback()
+    with file_lock(FEEDBACK_PATH):
+        _write_feedback_log(entries)
+
+
+def _append_feedback(entry):
+    """Append a single entry to the log. Returns the new entry count."""
+    _migrate_legacy_feedback()
     path = os.path.abspath(FEEDBACK_PATH)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(entries, f, indent=2)
+    with file_lock(path):
+        count = _feedback_count()
+        with open(path, "a+b") as f:
+            # A writer that died mid-append leaves a torn line without a newline;
+            # end it first so this entry starts on a line of its own
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write((json.dumps(entry) + "\n").encode())
+        count += 1
+        _write_feedback_index(count, os.path.getsize(path))
+    return count
+
+
+def _feedback_count():
+    """Return the number of stored entries, using the index when it is current."""
+    _migrate_legacy_feedback()
+    path = os.path.abspath(FEEDBACK_PATH)
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    index = _read_feedback_index()
+    if index and index.get("size") == size:
+        return index.get("count", 0)
+    # Index is stale (missing, or the log was edited out of band). Count from
+    # the cached snapshot; the next append rewrites the index under the lock.
+    return len(_feedback_snapshot()["entries"])
+
+
+# --- In-memory feedback index ---
+#
+# Lookups made on every generation (top prompts, negative examples, learned
+# defaults) read from an emotion-keyed index instead of re-parsing the log.
+# The index is rebuilt when the log's mtime/size changes (another process
+# wrote to it) or when save_feedback invalidates it.
+
+_feedback_cache = {"signature": None, "entries": [], "by_emotion": {}}
+_feedback_cache_lock = threading.Lock()
+
+
+def _feedback_signature():
+    """Return (mtime_ns, size) of the feedback log, or None if it doesn't exist."""
+    path = os.path.abspath(FEEDBACK_PATH)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _build_emotion_index(entries):
+    """Group entries by lowercased emotion, each list sorted by (rating, timestamp)."""
+    by_emotion = {}
+    for e in entries:
+        emotion = e.get("final_profile", {}).get("emotion", "").lower()
+        by_emotion.setdefault(emotion, []).append(e)
+    for group in by_emotion.values():
+        group.sort(key=lambda e: (e.get("rating", 0), e.get("timestamp", "")))
+    return by_emotion
+
+
+def _feedback_snapshot():
+    """Return the cached {entries, by_emotion} view, reloading if the log changed."""
+    global _feedback_cache
+    _migrate_legacy_feedback()
+    signature = _feedback_signature()
+    cache = _feedback_cache
+    if cache["signature"] is not None and cache["signature"] == signature:
+        return cache
+    with _feedback_cache_lock:
+        cache = _feedback_cache
+        if cache["signature"] is not None and cache["signature"] == signature:
+            return cache
+        entries = _load_feedback()
+        cache = {
+            "signature": signature,
+            "entries": entries,
+            "by_emotion": _build_emotion_index(entries),
+        }
+        _feedback_cache = cache
+        return cache
+
+
+def _invalidate_feedback_cache():
+    """Force the next snapshot to reload from disk."""
+    global _feedback_cache
+    with _feedback_cache_lock:
+        _feedback_cache = {"signature": None, "entries": [], "by_emotion": {}}
+
+
+def _get_emotion_entries(emotion):
+    """Return entries for an emotion, ascending by (rating, timestamp). Do not mutate."""
+    return _feedback_snapshot()["by_emotion"].get(emotion.lower(), [])
+
+
+# --- Columnar feedback statistics ---
+#
+# Summary and reflection statistics run over NumPy columns built once per
+# feedback snapshot instead of looping over entry dicts. Missing slider or
+# gen_params values are NaN; emotions are integer codes into a category list.
+
+def _as_number(value, default=np.nan):
+    """Return value if it is a real number, else default (bools and None included)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return default
+
+
+def _build_columns(entries):
+    """Convert entries into a dict of aligned NumPy arrays."""
+    def column(values):
+        return np.array(values, dtype=float) if values else np.empty(0)
+
+    emotions = [e.get("final_profile", {}).get("emotion", "").lower() for e in entries]
+    categories, codes = np.unique(np.array(emotions, dtype=object), return_inverse=True)
+    cols = {
+        "n": len(entries),
+        "rating": column([_as_number(e.get("rating"), 0) for e in entries]),
+        "would_replay": np.array([bool(e.get("would_replay", False)) for e in entries], dtype=bool),
+        "emotion_categories": [str(c) for c in categories],
+        "emotion_code": codes.astype(np.int64).reshape(-1),
+        "has_params": np.array([bool(e.get("gen_params")) for e in entries], dtype=bool),
+    }
+    for key in SLIDER_KEYS:
+        cols[key] = column([_as_number(e.get("final_profile", {}).get(key)) for e in entries])
+    for key in _PARAM_DEFAULTS:
+        cols[f"param_{key}"] = column([_as_number((e.get("gen_params") or {}).get(key)) for e in entries])
+    return cols
+
+
+def _feedback_columns(snapshot=None):
+    """Return the columnar view of a feedback snapshot, building it on first use."""
+    snapshot = snapshot or _feedback_snapshot()
+    cols = snapshot.get("columns")
+    if cols is None:
+        cols = _build_columns(snapshot["entries"])
+        snapshot["columns"] = cols
+    return cols
+
+
+def _emotion_code(cols, emotion):
+    """Return the category code for an emotion, or None if it has no entries."""
+    categories = cols["emotion_categories"]
+    i = int(np.searchsorted(categories, emotion.lower())) if categories else 0
+    if i < len(categories) and categories[i] == emotion.lower():
+        return i
+    return None
+
+
+def _slider_stats(cols):
+    """Group-by emotion: session count, mean rating and min/max/mean per slider."""
+    k = len(cols["emotion_categories"])
+    codes = cols["emotion_code"]
+    sessions = np.bincount(codes, minlength=k)
+    rating_sums = np.bincount(codes, weights=cols["rating"], minlength=k)
+
+    sliders = {}
+    for key in SLIDER_KEYS:
+        vals = cols[key]
+        present = ~np.isnan(vals)
+        counts = np.bincount(codes[present], minlength=k)
+        sums = np.bincount(codes[present], weights=vals[present], minlength=k)
+        lo = np.full(k, np.inf)
+        hi = np.full(k, -np.inf)
+        np.minimum.at(lo, codes[present], vals[present])
+        np.maximum.at(hi, codes[present], vals[present])
+        sliders[key] = (counts, sums, lo, hi)
+
+    stats = {}
+    for i, emotion in enumerate(cols["emotion_categories"]):
+        ranges = {}
+        for key, (counts, sums, lo, hi) in sliders.items():
+            if counts[i]:
+                ranges[key] = (int(lo[i]), int(hi[i]), round(float(sums[i] / counts[i])))
+        stats[emotion] = {
+            "sessions": int(sessions[i]),
+            "avg_rating": round(float(rating_sums[i] / sessions[i]), 1) if sessions[i] else 0,
+            "ranges": ranges,
+        }
+    return stats
 
 
 # --- Learned Rules I/O ---
+#
+# The knowledge base is read on nearly every step of a generation, so it is
+# cached per process. Each save bumps the "revision" counter stored in the
+# file; other processes notice a save through a cheap stat of the file and
+# only then re-parse it.
 
-def _load_learned_rules():
-    """Load learned rules from disk, returning defaults if missing."""
+_rules_cache = {"signature": None, "rules": None}
+_rules_cache_lock = threading.Lock()
+
+
+def _rules_signature():
+    """Return (mtime_ns, size) of the rules file, or None if it doesn't exist."""
     path = os.path.abspath(LEARNED_RULES_PATH)
-    if not os.path.exists(path):
-        return dict(_DEFAULT_RULES)
-    with open(path, "r") as f:
-        return json.load(f)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_learned_rules():
+    """Return learned rules (defaults if missing), re-reading only when the file changed.
+
+    The returned dict is shared across callers — treat it as read-only and
+    deep-copy before modifying.
+    """
+    global _rules_cache
+    signature = _rules_signature()
+    cache = _rules_cache
+    if cache["rules"] is not None and cache["signature"] == signature:
+        return cache["rules"]
+    with _rules_cache_lock:
+        if signature is None:
+            rules = copy.deepcopy(_DEFAULT_RULES)
+        else:
+            with open(os.path.abspath(LEARNED_RULES_PATH), "r") as f:
+                rules = json.load(f)
+        _rules_cache = {"signature": signature, "rules": rules}
+        return rules
 
 
 def _save_learned_rules(rules):
-    """Write learned rules to disk."""
-    path = os.path.abspath(LEARNED_RULES_PATH)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(rules, f, indent=2)
+    """Write learned rules to disk atomically, bumping the revision counter."""
+    global _rules_cache
+    with file_lock(LEARNED_RULES_PATH):
+        rules["revision"] = _load_learned_rules().get("revision", 0) + 1
+        atomic_write_json(LEARNED_RULES_PATH, rules, indent=2)
+        signature = _rules_signature()
+    with _rules_cache_lock:
+        _rules_cache = {"signature": signature, "rules": copy.deepcopy(rules)}
+
+
+def preload_knowledge():
+    """Warm the feedback index/columns and learned-rules caches ahead of use."""
+    _feedback_columns(_feedback_snapshot())
+    _load_learned_rules()
+
+
+def get_rules_revision():
+    """Return the knowledge base revision (0 until the first reflection is saved)."""
+    return _load_learned_rules().get("revision", 0)
 
 
 def get_learned_rules():
-    """Public accessor for the full knowledge base."""
+    """Public accessor for the full knowledge base (shared, read-only)."""
     return _load_learned_rules()
 
 
@@ -72,7 +381,6 @@ def get_learned_rules():
 def save_feedback(rating, would_replay, ai_profile, final_profile, music_prompt,
                   preferred_version="N/A", gen_params=None, user_note=None):
     """Append a feedback entry, then maybe trigger reflection."""
-    entries = _load_feedback()
     entry = {
         "timestamp": datetime.now().isoformat(),
         "rating": rating,
@@ -86,24 +394,22 @@ def save_feedback(rating, would_replay, ai_profile, final_profile, music_prompt,
         entry["gen_params"] = gen_params
     if user_note:
         entry["user_note"] = user_note
-    entries.append(entry)
-    _save_feedback(entries)
+    count = _append_feedback(entry)
+    _invalidate_feedback_cache()
 
     # Check if we should run a reflection cycle
-    _maybe_trigger_reflection(entries)
+    _maybe_trigger_reflection(count)
 
 
 def get_negative_examples(emotion, max_rating=2, limit=3):
     """Return prompts from low-rated sessions — used as 'avoid this' guidance."""
-    entries = _load_feedback()
-    bad = [
-        e for e in entries
-        if e.get("rating", 5) <= max_rating
-        and e.get("final_profile", {}).get("emotion", "").lower() == emotion.lower()
-        and e.get("music_prompt")
-    ]
-    bad.sort(key=lambda e: (e.get("rating", 5), e.get("timestamp", "")))
-    return [e["music_prompt"] for e in bad[:limit]]
+    bad = []
+    for e in _get_emotion_entries(emotion):
+        if e.get("rating", 0) > max_rating or len(bad) >= limit:
+            break
+        if e.get("rating", 5) <= max_rating and e.get("music_prompt"):
+            bad.append(e["music_prompt"])
+    return bad
 
 
 def get_emotion_profile(emotion):
@@ -143,60 +449,56 @@ def get_learned_defaults(emotion):
             return result
 
     # Fallback: average high-rated sessions
-    entries = _load_feedback()
-    good = [
-        e for e in entries
-        if e.get("rating", 0) >= 4
-        and e.get("final_profile", {}).get("emotion", "").lower() == emotion.lower()
-    ]
+    cols = _feedback_columns()
+    code = _emotion_code(cols, emotion)
+    if code is None:
+        return None
+    good = (cols["emotion_code"] == code) & (cols["rating"] >= 4)
 
-    if len(good) < 2:
+    if good.sum() < 2:
         return None
 
     result = {}
-    for key in ["energy", "style", "warmth", "arc"]:
-        values = [e["final_profile"][key] for e in good if key in e.get("final_profile", {})]
-        if values:
-            result[key] = round(sum(values) / len(values))
+    for key in SLIDER_KEYS:
+        values = cols[key][good]
+        values = values[~np.isnan(values)]
+        if values.size:
+            result[key] = round(float(values.mean()))
 
     return result
 
 
 def get_top_prompts(emotion, min_rating=4, limit=3):
     """Return music prompts from high-rated sessions with similar emotion."""
-    entries = _load_feedback()
-    good = [
-        e for e in entries
-        if e.get("rating", 0) >= min_rating
-        and e.get("final_profile", {}).get("emotion", "").lower() == emotion.lower()
-        and e.get("music_prompt")
-    ]
-    good.sort(key=lambda e: (e.get("rating", 0), e.get("timestamp", "")), reverse=True)
-    return [e["music_prompt"] for e in good[:limit]]
+    good = []
+    for e in reversed(_get_emotion_entries(emotion)):
+        if e.get("rating", 0) < min_rating or len(good) >= limit:
+            break
+        if e.get("music_prompt"):
+            good.append(e["music_prompt"])
+    return good
 
 
 def get_feedback_summary():
     """Return a summary of collected feedback including learning status."""
-    entries = _load_feedback()
-    if not entries:
+    cols = _feedback_columns()
+    if not cols["n"]:
         return None
 
-    ratings = [e.get("rating", 0) for e in entries]
-    replays = [e.get("would_replay", False) for e in entries]
-
     rules = _load_learned_rules()
-    entries_since = len(entries) - rules.get("entries_analyzed", 0)
+    entries_since = cols["n"] - rules.get("entries_analyzed", 0)
 
     return {
-        "total_sessions": len(entries),
-        "avg_rating": round(sum(ratings) / len(ratings), 1),
-        "replay_rate": round(sum(replays) / len(replays) * 100),
-        "high_rated": len([r for r in ratings if r >= 4]),
+        "total_sessions": cols["n"],
+        "avg_rating": round(float(cols["rating"].mean()), 1),
+        "replay_rate": round(float(cols["would_replay"].mean()) * 100),
+        "high_rated": int((cols["rating"] >= 4).sum()),
         "reflections_completed": rules.get("reflection_count", 0),
         "emotions_learned": list(rules.get("emotion_profiles", {}).keys()),
         "rules_active": len(rules.get("global_rules", {}).get("positive", []))
                       + len(rules.get("global_rules", {}).get("negative", [])),
         "next_reflection_in": max(0, REFLECTION_THRESHOLD - entries_since),
+        "reflection_status": get_reflection_status(),
     }
 
 
@@ -218,86 +520,233 @@ def _format_entries_for_reflection(entries):
     return "\n".join(lines)
 
 
-def _format_slider_ranges(entries):
-    """Summarize slider value distributions from entries."""
-    by_emotion = {}
-    for e in entries:
-        fp = e.get("final_profile", {})
-        emotion = fp.get("emotion", "unknown").lower()
-        if emotion not in by_emotion:
-            by_emotion[emotion] = {"energy": [], "style": [], "warmth": [], "arc": [], "ratings": []}
-        for key in ["energy", "style", "warmth", "arc"]:
-            if key in fp:
-                by_emotion[emotion][key].append(fp[key])
-        by_emotion[emotion]["ratings"].append(e.get("rating", 0))
+def _estimate_tokens(text):
+    """Rough token count for budgeting (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
 
+def _sample_for_reflection(entries, token_budget=None):
+    """Pick a stratified sample of entries whose formatted listing fits the budget.
+
+    Strata are interleaved round-robin so every kind of signal is represented:
+    entries with user notes, highest-rated, lowest-rated, and most recent.
+    The sample is returned in original (chronological) order.
+    """
+    budget = REFLECTION_TOKEN_BUDGET if token_budget is None else token_budget
+    costs = [_estimate_tokens(_format_entries_for_reflection([e])) for e in entries]
+    if sum(costs) <= budget:
+        return list(entries)
+
+    recent = list(range(len(entries) - 1, -1, -1))
+    strata = [
+        [i for i in recent if entries[i].get("user_note")],
+        sorted(recent, key=lambda i: -entries[i].get("rating", 0)),
+        sorted(recent, key=lambda i: entries[i].get("rating", 0)),
+        recent,
+    ]
+
+    chosen = set()
+    used = 0
+    for ranked in zip_longest(*strata):
+        for i in ranked:
+            if i is None or i in chosen or used + costs[i] > budget:
+                continue
+            chosen.add(i)
+            used += costs[i]
+        if used >= budget:
+            break
+    return [entries[i] for i in sorted(chosen)]
+
+
+def _format_slider_ranges(stats):
+    """Summarize slider value distributions from _slider_stats output (or a subset of its emotions)."""
     lines = []
-    for emotion, data in by_emotion.items():
-        parts = []
-        for key in ["energy", "style", "warmth", "arc"]:
-            vals = data[key]
-            if vals:
-                parts.append(f"{key}: {min(vals)}-{max(vals)} (avg {round(sum(vals)/len(vals))})")
-        avg_r = round(sum(data["ratings"]) / len(data["ratings"]), 1) if data["ratings"] else 0
-        lines.append(f"{emotion} ({len(data['ratings'])} sessions, avg rating {avg_r}): {', '.join(parts)}")
+    for emotion, data in stats.items():
+        parts = [
+            f"{key}: {lo}-{hi} (avg {avg})"
+            for key, (lo, hi, avg) in data["ranges"].items()
+        ]
+        lines.append(
+            f"{emotion or 'unknown'} ({data['sessions']} sessions, avg rating {data['avg_rating']}): "
+            f"{', '.join(parts)}"
+        )
     return "\n".join(lines)
 
 
-def _compute_param_insights(entries):
-    """Correlate MusicGen gen_params with ratings."""
-    with_params = [e for e in entries if e.get("gen_params")]
-    if not with_params:
-        return None
+def _compute_param_insights(entries, cols, previous=None):
+    """Correlate MusicGen gen_params with ratings.
 
-    # Group by rating bucket
-    high = [e for e in with_params if e.get("rating", 0) >= 4]
-    low = [e for e in with_params if e.get("rating", 0) <= 2]
+    `previous` is the last saved param_insights. If it carries running
+    aggregates and the log has only grown since, just the new rows are
+    folded in; otherwise everything is recomputed from scratch.
+    """
+    running = (previous or {}).get("running")
+    if running and running.get("entries_seen", 0) <= cols["n"]:
+        start = running["entries_seen"]
+        history = list(previous.get("param_history", []))
+        high_count = running.get("high_count", 0)
+        high_sums = dict(running.get("high_sums", {}))
+    else:
+        start = 0
+        history = []
+        high_count = 0
+        high_sums = {}
+
+    has_params = cols["has_params"][start:]
+    new_rows = np.flatnonzero(has_params)[-10:] + start
+    history.extend(
+        {"rating": entries[i].get("rating"), "params": entries[i].get("gen_params")}
+        for i in new_rows
+    )
+    high = has_params & (cols["rating"][start:] >= 4)
+    high_count += int(high.sum())
+    for key, default in _PARAM_DEFAULTS.items():
+        vals = cols[f"param_{key}"][start:][high]
+        vals = np.where(np.isnan(vals), default, vals)
+        high_sums[key] = high_sums.get(key, 0) + float(vals.sum())
+
+    if not history:
+        return None
 
-    def avg_param(group, key, default):
-        vals = [e["gen_params"].get(key, default) for e in group]
-        return round(sum(vals) / len(vals), 2) if vals else default
+    def avg_param(key):
+        if not high_count:
+            return _PARAM_DEFAULTS[key]
+        return round(high_sums.get(key, 0) / high_count, 2)
 
     return {
-        "best_temperature": avg_param(high, "temperature", 1.0) if high else 1.0,
-        "best_guidance_scale": avg_param(high, "guidance_scale", 3.0) if high else 3.0,
-        "best_max_new_tokens": round(avg_param(high, "max_new_tokens", 256)) if high else 256,
-        "param_history": [
-            {"rating": e.get("rating"), "params": e.get("gen_params")}
-            for e in with_params[-10:]  # Keep last 10
-        ],
+        "best_temperature": avg_param("temperature"),
+        "best_guidance_scale": avg_param("guidance_scale"),
+        "best_max_new_tokens": round(avg_param("max_new_tokens")),
+        "param_history": history[-10:],  # Keep last 10
+        "running": {
+            "entries_seen": cols["n"],
+            "high_count": high_count,
+            "high_sums": high_sums,
+        },
     }
 
 
-def _maybe_trigger_reflection(entries):
-    """Gate reflection to run every REFLECTION_THRESHOLD new ratings."""
+def _reflection_due(entry_count):
+    """True once REFLECTION_THRESHOLD ratings have arrived since the last reflection."""
     rules = _load_learned_rules()
-    entries_since = len(entries) - rules.get("entries_analyzed", 0)
-    if entries_since >= REFLECTION_THRESHOLD:
-        run_reflection()
+    entries_since = entry_count - rules.get("entries_analyzed", 0)
+    return entries_since >= REFLECTION_THRESHOLD
 
 
-def run_reflection():
-    """Core batch learning: analyze feedback to extract reusable rules.
+def _maybe_trigger_reflection(entry_count):
+    """Gate reflection to run every REFLECTION_THRESHOLD new ratings."""
+    if _reflection_due(entry_count):
+        _request_reflection()
+
+
+# --- Background reflection worker ---
+#
+# Reflection makes several Gemini calls, so it runs on a single daemon thread
+# instead of inside save_feedback. Requests made while one is already queued
+# are dropped; a request made while a reflection is running queues exactly one
+# follow-up, which re-checks the gate before doing any work.
+
+_reflection_jobs = queue.Queue()
+_reflection_lock = threading.Lock()
+_reflection_worker = None
+_reflection_status = {
+    "state": "idle",           # "idle" | "running"
+    "pending": False,
+    "last_started": None,
+    "last_finished": None,
+    "last_duration": None,     # seconds
+    "last_error": None,
+}
+_reflection_loop = None  # Event loop every reflection's async calls run on; see _run_on_reflection_loop()
 
-    Phase A: Global rules from high vs. low-rated prompts
-    Phase B: Per-emotion analysis
-    Phase C: Parameter correlation
+
+def _run_reflection_jobs():
+    """Worker loop: run queued reflections one at a time."""
+    while True:
+        _reflection_jobs.get()
+        with _reflection_lock:
+            _reflection_status["pending"] = False
+        try:
+            if not _reflection_due(_feedback_count()):
+                continue
+            # Only one process reflects at a time; others skip this round
+            with file_lock(REFLECTION_LOCK_PATH, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                with _reflection_lock:
+                    _reflection_status["state"] = "running"
+                    _reflection_status["last_started"] = datetime.now().isoformat()
+                start = time.monotonic()
+                error = None
+                try:
+                    run_reflection()
+                except Exception as e:
+                    error = str(e)
+            with _reflection_lock:
+                _reflection_status["state"] = "idle"
+                _reflection_status["last_finished"] = datetime.now().isoformat()
+                _reflection_status["last_duration"] = round(time.monotonic() - start, 2)
+                _reflection_status["last_error"] = error
+        finally:
+            _reflection_jobs.task_done()
+
+
+def _request_reflection():
+    """Queue a reflection on the worker thread. Returns False if one is already queued."""
+    global _reflection_worker
+    with _reflection_lock:
+        if _reflection_status["pending"]:
+            return False
+        _reflection_status["pending"] = True
+        if _reflection_worker is None or not _reflection_worker.is_alive():
+            _reflection_worker = threading.Thread(
+                target=_run_reflection_jobs, name="reflection-worker", daemon=True
+            )
+            _reflection_worker.start()
+    _reflection_jobs.put(None)
+    return True
+
+
+def _run_on_reflection_loop(coro):
+    """Run coro to completion on one event loop that lives as long as the process.
+
+    The Gemini async client keeps pooled connections tied to the loop that
+    opened them, so a fresh asyncio.run() loop per reflection would break
+    them once the first loop closed.
     """
-    entries = _load_feedback()
-    if len(entries) < REFLECTION_THRESHOLD:
-        return
+    global _reflection_loop
+    with _reflection_lock:
+        if _reflection_loop is None:
+            _reflection_loop = asyncio.new_event_loop()
+            threading.Thread(target=_reflection_loop.run_forever, name="reflection-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _reflection_loop).result()
 
-    rules = _load_learned_rules()
-    formatted = _format_entries_for_reflection(entries)
-    slider_summary = _format_slider_ranges(entries)
 
+def get_reflection_status():
+    """Return a snapshot of the background reflection worker's state."""
+    with _reflection_lock:
+        return dict(_reflection_status)
+
+
+def wait_for_reflection():
+    """Block until every queued reflection has finished (for scripts and shutdown)."""
+    _reflection_jobs.join()
+
+
+async def _reflect_global_rules(entries):
+    """Phase A: ask Gemini for global prompt rules from high vs. low-rated sessions."""
+    sample = _sample_for_reflection(entries)
+    formatted = _format_entries_for_reflection(sample)
     high = [e for e in entries if e.get("rating", 0) >= 4]
     low = [e for e in entries if e.get("rating", 0) <= 2]
+    if len(sample) < len(entries):
+        listing = f"Here is a representative sample of {len(sample)} of {len(entries)} feedback entries"
+    else:
+        listing = "Here are all feedback entries"
 
-    # --- Phase A: Global rules ---
     phase_a_prompt = f"""You are a music AI trainer analyzing user feedback on AI-generated music.
 
-Here are all feedback entries (rating 1-5, with the prompt used):
+{listing} (rating 1-5, with the prompt used):
 
 {formatted}
 
@@ -315,35 +764,24 @@ Return JSON:
 Rules should be specific and actionable (e.g. "Naming 2-3 specific instruments works better than genre labels").
 Return 2-4 rules per category. Return ONLY the JSON."""
 
-    try:
-        global_rules = ask_json(phase_a_prompt)
-        rules["global_rules"] = {
-            "positive": global_rules.get("positive", [])[:4],
-            "negative": global_rules.get("negative", [])[:4],
-        }
-    except Exception:
-        pass  # Keep existing rules if Gemini fails
+    global_rules = await ask_json_async(phase_a_prompt, cache=False)
+    return {
+        "positive": global_rules.get("positive", [])[:4],
+        "negative": global_rules.get("negative", [])[:4],
+    }
 
-    # --- Phase B: Per-emotion analysis ---
-    emotions_seen = set()
-    for e in entries:
-        emo = e.get("final_profile", {}).get("emotion", "").lower()
-        if emo:
-            emotions_seen.add(emo)
 
-    for emotion in emotions_seen:
-        emo_entries = [
-            e for e in entries
-            if e.get("final_profile", {}).get("emotion", "").lower() == emotion
-        ]
-        if len(emo_entries) < 2:
-            continue
+async def _reflect_emotion(emotion, emo_entries, emo_stats):
+    """Phase B: ask Gemini for a learned profile for one emotion.
 
-        emo_formatted = _format_entries_for_reflection(emo_entries)
-        emo_high = [e for e in emo_entries if e.get("rating", 0) >= 4]
-        emo_ratings = [e.get("rating", 0) for e in emo_entries]
+    Only this emotion's entries (sampled to the token budget) and slider
+    ranges go into the prompt, so its size doesn't grow with other emotions.
+    """
+    emo_formatted = _format_entries_for_reflection(_sample_for_reflection(emo_entries))
+    slider_summary = _format_slider_ranges({emotion: emo_stats}) if emo_stats else ""
+    emo_ratings = [e.get("rating", 0) for e in emo_entries]
 
-        phase_b_prompt = f"""Analyze feedback for the emotion "{emotion}" in AI music generation.
+    phase_b_prompt = f"""Analyze feedback for the emotion "{emotion}" in AI music generation.
 
 Entries:
 {emo_formatted}
@@ -367,16 +805,93 @@ Return JSON for this emotion:
 Base ranges on the actual slider values from high-rated sessions.
 Return 1-3 items per list. Return ONLY the JSON."""
 
-        try:
-            emo_profile = ask_json(phase_b_prompt)
-            emo_profile["sample_count"] = len(emo_entries)
-            emo_profile["avg_rating"] = round(sum(emo_ratings) / len(emo_ratings), 1)
-            rules.setdefault("emotion_profiles", {})[emotion] = emo_profile
-        except Exception:
-            pass
+    emo_profile = await ask_json_async(phase_b_prompt, cache=False)
+    emo_profile["sample_count"] = len(emo_entries)
+    emo_profile["entries_analyzed"] = len(emo_entries)
+    emo_profile["avg_rating"] = round(sum(emo_ratings) / len(emo_ratings), 1)
+    return emo_profile
+
+
+def _profile_watermark(profile):
+    """Number of entries an emotion profile was built from (0 if there is none)."""
+    if not profile:
+        return 0
+    return profile.get("entries_analyzed", profile.get("sample_count", 0))
+
+
+async def _reflect_concurrently(entries, stale, slider_stats):
+    """Run Phase A and the Phase B calls together, at most REFLECTION_MAX_CONCURRENCY at once.
+
+    Returns (global_rules, [profile per stale emotion]); failures come back as
+    exception objects instead of raising.
+    """
+    semaphore = asyncio.Semaphore(max(1, REFLECTION_MAX_CONCURRENCY))
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    # --- Phase A: Global rules / Phase B: Per-emotion analysis ---
+    results = await asyncio.gather(
+        bounded(_reflect_global_rules(entries)),
+        *(
+            bounded(_reflect_emotion(emotion, emo_entries, slider_stats.get(emotion)))
+            for emotion, emo_entries in stale.items()
+        ),
+        return_exceptions=True,
+    )
+    return results[0], results[1:]
+
+
+def run_reflection():
+    """Core batch learning: analyze feedback to extract reusable rules.
+
+    Phase A: Global rules from high vs. low-rated prompts
+    Phase B: Per-emotion analysis
+    Phase C: Parameter correlation
+
+    Phase A and the per-emotion Phase B calls are independent, so they run
+    concurrently on the long-lived reflection event loop, capped at
+    REFLECTION_MAX_CONCURRENCY in-flight requests.
+    A failed call keeps the existing rules/profile for that part.
+
+    Reflection is incremental: Phase B only re-runs for emotions whose entry
+    count moved past the profile's "entries_analyzed" watermark, and Phase C
+    updates running aggregates with just the entries added since last time.
+    """
+    snapshot = _feedback_snapshot()
+    entries = snapshot["entries"]
+    if len(entries) < REFLECTION_THRESHOLD:
+        return
+    cols = _feedback_columns(snapshot)
+
+    rules = copy.deepcopy(_load_learned_rules())
+
+    by_emotion = {}
+    for e in entries:
+        emo = e.get("final_profile", {}).get("emotion", "").lower()
+        if emo:
+            by_emotion.setdefault(emo, []).append(e)
+
+    profiles = rules.get("emotion_profiles", {})
+    stale = {
+        emotion: emo_entries
+        for emotion, emo_entries in by_emotion.items()
+        if len(emo_entries) >= 2
+        and len(emo_entries) != _profile_watermark(profiles.get(emotion))
+    }
+    slider_stats = _slider_stats(cols)  # One group-by pass; each Phase B call gets its emotion's row
+    global_rules, emotion_results = _run_on_reflection_loop(_reflect_concurrently(entries, stale, slider_stats))
+
+    if not isinstance(global_rules, Exception):  # Keep existing rules if Gemini fails
+        rules["global_rules"] = global_rules
+
+    for emotion, result in zip(stale, emotion_results):
+        if not isinstance(result, Exception):
+            rules.setdefault("emotion_profiles", {})[emotion] = result
 
     # --- Phase C: Parameter correlation ---
-    param_insights = _compute_param_insights(entries)
+    param_insights = _compute_param_insights(entries, cols, rules.get("param_insights"))
     if param_insights:
         rules["param_insights"] = param_insights
 
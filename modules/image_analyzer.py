@@ -1,8 +1,50 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from utils.image_prep import hash_distance, prepare_image
 from utils.llm_client import ask_json_with_image
 
+load_dotenv()
+
+IMAGE_CACHE_ENTRIES = int(os.getenv("IMAGE_CACHE_ENTRIES", "256"))  # 0 disables the mood cache
+IMAGE_HASH_DISTANCE = int(os.getenv("IMAGE_HASH_DISTANCE", "6"))  # Max differing hash bits (of 128) for a near-duplicate
+
+# Mood results keyed by perceptual hash, so re-uploading the same photo (or a
+# re-saved, resized or lightly edited copy) skips the vision call entirely.
+_mood_cache = OrderedDict()  # phash -> mood dict
+_mood_cache_lock = threading.Lock()
+
+
+def _cached_mood(phash):
+    """Return a copy of the cached mood for phash or a near-duplicate, else None."""
+    with _mood_cache_lock:
+        match = phash if phash in _mood_cache else next(
+            (h for h in reversed(_mood_cache) if hash_distance(h, phash) <= IMAGE_HASH_DISTANCE), None
+        )
+        if match is None:
+            return None
+        _mood_cache.move_to_end(match)
+        return copy.deepcopy(_mood_cache[match])
+
+
+def _remember_mood(phash, mood):
+    with _mood_cache_lock:
+        _mood_cache[phash] = copy.deepcopy(mood)
+        _mood_cache.move_to_end(phash)
+        while len(_mood_cache) > IMAGE_CACHE_ENTRIES:
+            _mood_cache.popitem(last=False)
+
 
 def analyze_image(image_bytes):
     """Analyze an image for emotional content. Returns mood dict."""
+    image_bytes, phash = prepare_image(image_bytes)
+    if IMAGE_CACHE_ENTRIES > 0:
+        cached = _cached_mood(phash)
+        if cached is not None:
+            return cached
+
     prompt = """Analyze this image for its emotional content.
 Return ONLY a JSON object with these keys:
 - caption: one sentence describing what you see
@@ -17,4 +59,6 @@ Return ONLY valid JSON, no other text."""
 
     result = ask_json_with_image(prompt, image_bytes)
     result["source"] = "image"
+    if IMAGE_CACHE_ENTRIES > 0:
+        _remember_mood(phash, result)
     return result
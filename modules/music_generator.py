@@ -1,24 +1,132 @@
 import io
 import os
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+from contextlib import nullcontext
+import numpy as np
 import scipy.io.wavfile
-from transformers import AutoProcessor, MusicgenForConditionalGeneration
+import torch
+from transformers import (
+    AutoProcessor,
+    MusicgenForConditionalGeneration,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+from utils import audio_cache
 
 MODEL_ID = os.getenv("HF_MODEL_ID", "facebook/musicgen-small")
+MUSICGEN_BATCHING = os.getenv("MUSICGEN_BATCHING", "1") != "0"
+MUSICGEN_MAX_BATCH = int(os.getenv("MUSICGEN_MAX_BATCH", "8"))  # Prompts per forward pass (2 per A/B request)
+MUSICGEN_MAX_WAIT = float(os.getenv("MUSICGEN_MAX_WAIT", "0.25"))  # Seconds to wait for more requests
+MUSICGEN_STREAMING = os.getenv("MUSICGEN_STREAMING", "0") != "0"  # Default for the app's audio preview toggle
+MUSICGEN_STREAM_STEPS = int(os.getenv("MUSICGEN_STREAM_STEPS", "50"))  # Tokens per streamed chunk (50 = ~1s of audio)
+MUSICGEN_WINDOW_TOKENS = int(os.getenv("MUSICGEN_WINDOW_TOKENS", "1000"))  # Longer tracks are generated in windows
+MUSICGEN_CONTEXT_TOKENS = int(os.getenv("MUSICGEN_CONTEXT_TOKENS", "250"))  # Previous audio each window continues
+MUSICGEN_CROSSFADE_TOKENS = int(os.getenv("MUSICGEN_CROSSFADE_TOKENS", "50"))  # Overlap blended at each seam
+# CPU inference modes, comma-separated: int8 (dynamic quantization of linear layers), bf16 (autocast), compile
+MUSICGEN_INFERENCE = [m.strip() for m in os.getenv("MUSICGEN_INFERENCE", "").split(",") if m.strip()]
+MUSICGEN_THREADS = int(os.getenv("MUSICGEN_THREADS", "0"))  # Intra-op threads; 0 = torch default (all cores)
+
+_INFERENCE_MODES = ("int8", "bf16", "compile")
+_modes = None  # MUSICGEN_INFERENCE minus modes this machine can't use; see _active_modes()
+
+_GENERATE_PARAMS = {"do_sample": True}  # Sampling settings passed to every generate call (part of the cache key)
+_VARIATION_SUFFIXES = ["", " with subtle variation in rhythm and texture"]
 
 _model = None
 _processor = None
+_load_lock = threading.Lock()  # Warmup and a first request may race to load
 
 
 def _load_model():
     global _model, _processor
     if _model is None:
-        print(f"Loading {MODEL_ID}... (first time takes ~1-2 min to download)")
-        _processor = AutoProcessor.from_pretrained(MODEL_ID)
-        _model = MusicgenForConditionalGeneration.from_pretrained(MODEL_ID)
-        print("Model loaded.")
+        with _load_lock:
+            if _model is None:
+                print(f"Loading {MODEL_ID}... (first time takes ~1-2 min to download)")
+                _processor = AutoProcessor.from_pretrained(MODEL_ID)
+                model = MusicgenForConditionalGeneration.from_pretrained(MODEL_ID)
+                _apply_inference_modes(model)
+                _model = model
+                print("Model loaded.")
     return _model, _processor
 
 
+# --- CPU Inference Modes ---
+#
+# from_pretrained gives an fp32 model on torch's default threading. These
+# opt-in modes trade a little fidelity or startup time for speed on CPU
+# boxes; scripts/bench_musicgen.py compares them. Outputs differ between
+# modes, so the active modes are part of the audio cache key.
+
+
+def _bf16_supported():
+    """True if the CPU has native bf16 matmuls (AVX512-BF16 or AMX); emulated bf16 is slower than fp32."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def _resolve_modes(requested):
+    """Validate requested inference modes and drop ones that can't be used here."""
+    unknown = [m for m in requested if m not in _INFERENCE_MODES]
+    if unknown:
+        raise ValueError(f"Unknown MUSICGEN_INFERENCE modes: {unknown} (expected some of {list(_INFERENCE_MODES)})")
+    modes = list(requested)
+    if "bf16" in modes and "int8" in modes:
+        # Dynamic-quantized Linear layers only accept fp32 activations, and autocast would feed them bf16
+        warnings.warn("MUSICGEN_INFERENCE: bf16 ignored because int8 is enabled (quantized layers need fp32 input)")
+        modes.remove("bf16")
+    if "bf16" in modes and not _bf16_supported():
+        warnings.warn("MUSICGEN_INFERENCE=bf16 ignored: this CPU has no native bf16 support")
+        modes.remove("bf16")
+    return modes
+
+
+def _active_modes():
+    global _modes
+    if _modes is None:
+        _modes = _resolve_modes(MUSICGEN_INFERENCE)
+    return _modes
+
+
+def _apply_inference_modes(model, modes=None):
+    modes = _active_modes() if modes is None else modes
+    if MUSICGEN_THREADS > 0:
+        torch.set_num_threads(MUSICGEN_THREADS)
+    if "int8" in modes:
+        # Weights stored as int8, activations quantized on the fly; EnCodec's convs stay fp32
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if "compile" in modes:
+        # The decoder step runs once per token; dynamic shapes avoid a recompile as the sequence grows
+        model.decoder.forward = torch.compile(model.decoder.forward, dynamic=True)
+    if modes:
+        print(f"MusicGen inference modes: {', '.join(modes)}")
+
+
+def _inference_context(modes=None):
+    """bf16 autocast if that mode is active, else a no-op context."""
+    modes = _active_modes() if modes is None else modes
+    return torch.autocast("cpu", dtype=torch.bfloat16) if "bf16" in modes else nullcontext()
+
+
+def _generate(model, **kwargs):
+    """model.generate with the shared sampling params, under the inference context."""
+    with _inference_context():
+        return model.generate(**kwargs, **_GENERATE_PARAMS)
+
+
+def warmup():
+    """Load MusicGen and run a tiny batched generation so the first request pays no cold start."""
+    _generate_batch(_variation_prompts("warmup", 2), max_new_tokens=4)  # Not generate_music: a cache hit would skip the model
+
+
 def _to_wav_bytes(audio_numpy, sample_rate):
     """Convert numpy audio array to WAV bytes."""
     buf = io.BytesIO()
@@ -26,26 +134,389 @@ def _to_wav_bytes(audio_numpy, sample_rate):
     return buf.getvalue()
 
 
-def generate_music(prompt, num_variations=2, max_new_tokens=128):
-    """Generate variations from a prompt in a single batched call. Returns list of wav byte buffers."""
-    model, processor = _load_model()
-
-    prompts = [prompt]
-    if num_variations >= 2:
-        prompts.append(prompt + " with subtle variation in rhythm and texture")
+def _generate_batch(prompts, max_new_tokens, seed=None):
+    """Run one batched model.generate over prompts. Returns one wav byte buffer per prompt.
 
+    seed reseeds torch's global RNG first, so the same prompts and seed give
+    the same audio as long as no other generation runs at the same time.
+    """
+    model, processor = _load_model()
     inputs = processor(text=prompts, padding=True, return_tensors="pt")
-    audio_values = model.generate(**inputs, do_sample=True, max_new_tokens=max_new_tokens)
+    if seed is not None:
+        torch.manual_seed(seed)
+    audio_values = _generate(model, **inputs, max_new_tokens=max_new_tokens)
 
     sample_rate = model.config.audio_encoder.sampling_rate
     results = []
     for i in range(audio_values.shape[0]):
-        audio_numpy = audio_values[i, 0].cpu().numpy()
+        audio_numpy = audio_values[i, 0].cpu().float().numpy()
         results.append(_to_wav_bytes(audio_numpy, sample_rate))
+    return results
 
+
+def _variation_prompts(prompt, num_variations):
+    return [prompt + suffix for suffix in _VARIATION_SUFFIXES[:max(1, min(num_variations, 2))]]
+
+
+def _cache_keys(prompt, num_variations, max_new_tokens, seed):
+    suffixes = _VARIATION_SUFFIXES[:max(1, min(num_variations, 2))]
+    params = dict(_GENERATE_PARAMS, inference=sorted(_active_modes())) if _active_modes() else _GENERATE_PARAMS
+    return [
+        audio_cache.audio_key(MODEL_ID, prompt, suffix, suffixes, max_new_tokens, params, seed)
+        for suffix in suffixes
+    ]
+
+
+def _cached(keys):
+    """Return the cached wav buffers for keys, or None unless every one is present."""
+    results = []
+    for key in keys:
+        wav = audio_cache.get(key)
+        if wav is None:
+            return None
+        results.append(wav)
     return results
 
 
+def generate_music(prompt, num_variations=2, max_new_tokens=128, seed=None):
+    """Generate variations from a prompt in a single batched call. Returns list of wav byte buffers.
+
+    Results are cached on disk by prompt, length, sampling settings and seed,
+    so a repeat request returns without touching the model; pass a different
+    seed for a fresh take. With MUSICGEN_BATCHING on, a miss is queued and may
+    share its forward pass with other sessions' requests (see below). Tracks
+    longer than MUSICGEN_WINDOW_TOKENS are generated in windows instead.
+    """
+    keys = _cache_keys(prompt, num_variations, max_new_tokens, seed)
+    results = _cached(keys)
+    if results is not None:
+        return results
+    prompts = _variation_prompts(prompt, num_variations)
+    if max_new_tokens > MUSICGEN_WINDOW_TOKENS:
+        audio = generate_long_audio(prompt, num_variations, max_new_tokens, seed)
+        results = [_to_wav_bytes(row, get_sample_rate()) for row in audio]
+    elif MUSICGEN_BATCHING:
+        results = _submit(prompts, max_new_tokens, seed).result()
+    else:
+        results = _generate_batch(prompts, max_new_tokens, seed)
+    for key, wav in zip(keys, results):
+        audio_cache.put(key, wav)
+    return results
+
+
+def prewarm_cache(prompts, num_variations=2, max_new_tokens=128, seed=None):
+    """Generate and cache audio for prompts that aren't cached yet. Returns how many were generated."""
+    generated = 0
+    for prompt in prompts:
+        if _cached(_cache_keys(prompt, num_variations, max_new_tokens, seed)) is None:
+            generate_music(prompt, num_variations, max_new_tokens, seed)
+            generated += 1
+    return generated
+
+
+# --- Cross-Session Batching ---
+#
+# Concurrent users would otherwise each run their own forward pass and fight
+# over the same CPU cores. A single worker thread collects requests for up to
+# MUSICGEN_MAX_WAIT seconds (or until MUSICGEN_MAX_BATCH prompts are waiting),
+# groups them by max_new_tokens, runs one padded generate per group and hands
+# each caller back its own slice of the outputs. Seeded requests run as a
+# batch of their own so their audio doesn't depend on who else was queued.
+
+_requests = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_batch_stats = {"requests": 0, "batches": 0, "prompts": 0, "largest_batch": 0}
+
+
+class _Request:
+    def __init__(self, prompts, max_new_tokens, seed=None):
+        self.prompts = prompts
+        self.max_new_tokens = max_new_tokens
+        self.seed = seed
+        self.future = Future()
+
+
+def _submit(prompts, max_new_tokens, seed=None):
+    """Queue a generation for the batching worker. Returns a Future of wav buffers."""
+    global _worker
+    request = _Request(prompts, max_new_tokens, seed)
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_batches, name="musicgen-batcher", daemon=True)
+            _worker.start()
+    _requests.put(request)
+    return request.future
+
+
+def _collect_window():
+    """Block for one request, then gather more until the window closes or the batch is full."""
+    window = [_requests.get()]
+    prompts = len(window[0].prompts)
+    deadline = time.monotonic() + MUSICGEN_MAX_WAIT
+    while prompts < MUSICGEN_MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            request = _requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        window.append(request)
+        prompts += len(request.prompts)
+    return window
+
+
+def _pack(requests):
+    """Split same-length requests into batches of at most MUSICGEN_MAX_BATCH prompts (a request is never split)."""
+    batch, size = [], 0
+    for request in requests:
+        if batch and size + len(request.prompts) > MUSICGEN_MAX_BATCH:
+            yield batch
+            batch, size = [], 0
+        batch.append(request)
+        size += len(request.prompts)
+    if batch:
+        yield batch
+
+
+def _run_batches():
+    """Worker loop: batch queued requests across sessions and demultiplex the results."""
+    while True:
+        groups = {}
+        for request in _collect_window():
+            groups.setdefault((request.max_new_tokens, request.seed), []).append(request)
+        for (max_new_tokens, seed), group in groups.items():
+            for batch in (_pack(group) if seed is None else ([request] for request in group)):
+                prompts = [p for request in batch for p in request.prompts]
+                try:
+                    results = _generate_batch(prompts, max_new_tokens, seed)
+                except Exception as e:
+                    for request in batch:
+                        request.future.set_exception(e)
+                    continue
+                with _worker_lock:
+                    _batch_stats["requests"] += len(batch)
+                    _batch_stats["batches"] += 1
+                    _batch_stats["prompts"] += len(prompts)
+                    _batch_stats["largest_batch"] = max(_batch_stats["largest_batch"], len(prompts))
+                start = 0
+                for request in batch:
+                    request.future.set_result(results[start:start + len(request.prompts)])
+                    start += len(request.prompts)
+
+
+def get_batching_stats():
+    """Return counters for the cross-session batching worker."""
+    with _worker_lock:
+        stats = dict(_batch_stats)
+    stats["avg_batch"] = round(stats["prompts"] / stats["batches"], 2) if stats["batches"] else 0.0
+    return stats
+
+
+# --- Long-Form Generation ---
+#
+# Attention cost and memory grow with sequence length, so tracks longer than
+# MUSICGEN_WINDOW_TOKENS are built window by window. Each window after the
+# first is prompted with the text plus the last MUSICGEN_CONTEXT_TOKENS of
+# audio so far; MusicGen re-encodes that audio, continues it, and returns
+# the context followed by the new audio. The end of the re-decoded context is
+# crossfaded with the existing tail to hide the seam. Every window is the
+# same length, so memory stays flat and time grows linearly with duration.
+
+
+def _crossfade(existing, window, context_samples, fade_samples):
+    """Append window, whose first context_samples re-decode existing's tail, with a linear seam.
+
+    Both sides of the overlap are renderings of the same audio, i.e. strongly
+    correlated, so gains that sum to 1 keep the level flat; an equal-power
+    curve would bump it by up to 3 dB mid-seam.
+    """
+    fade_samples = min(fade_samples, context_samples, existing.shape[-1])
+    if fade_samples <= 0:
+        return np.concatenate([existing, window[:, context_samples:]], axis=-1)
+    fade_in = np.linspace(0.0, 1.0, fade_samples, dtype=np.float32)
+    seam = existing[:, -fade_samples:] * (1 - fade_in) + window[:, context_samples - fade_samples:context_samples] * fade_in
+    return np.concatenate([existing[:, :-fade_samples], seam, window[:, context_samples:]], axis=-1)
+
+
+def generate_long_audio(prompt, num_variations=2, max_new_tokens=3000, seed=None, on_window=None):
+    """Generate max_new_tokens of audio in overlapping windows. Returns float32 (num_variations, samples).
+
+    on_window(audio) receives the track so far after each window. Runs its
+    own generate calls; long tracks don't join cross-session batches.
+    """
+    model, processor = _load_model()
+    prompts = _variation_prompts(prompt, num_variations)
+    sample_rate = model.config.audio_encoder.sampling_rate
+    hop_length = int(np.prod(model.config.audio_encoder.upsampling_ratios))  # Samples per token
+    window = max(MUSICGEN_WINDOW_TOKENS, MUSICGEN_CONTEXT_TOKENS + model.decoder.num_codebooks + 1)
+    target = max_new_tokens * hop_length
+    if seed is not None:
+        torch.manual_seed(seed)
+
+    inputs = processor(text=prompts, padding=True, return_tensors="pt")
+    audio = _generate(model, **inputs, max_new_tokens=window)[:, 0].cpu().float().numpy()
+    if on_window:
+        on_window(audio)
+    while audio.shape[-1] < target:
+        context = audio[:, -MUSICGEN_CONTEXT_TOKENS * hop_length:]
+        inputs = processor(
+            audio=list(context), text=prompts, sampling_rate=sample_rate, padding=True, return_tensors="pt"
+        )
+        out = _generate(model, **inputs, max_new_tokens=window - MUSICGEN_CONTEXT_TOKENS)
+        out = out[:, 0].cpu().float().numpy()
+        if out.shape[-1] <= context.shape[-1]:
+            break  # No new audio; return what we have rather than loop forever
+        audio = _crossfade(audio, out, context.shape[-1], MUSICGEN_CROSSFADE_TOKENS * hop_length)
+        if on_window:
+            on_window(audio[:, :target])
+    return audio[:, :target]
+
+
+# --- Streaming ---
+#
+# model.generate only decodes audio after the last token. The streamer below
+# watches the codes as they are sampled and re-runs that final step (undo the
+# codebook delay pattern, EnCodec-decode) on the tokens so far every
+# MUSICGEN_STREAM_STEPS tokens, so playback can start after about a second
+# of audio instead of after the whole track. It hooks in as a stopping
+# criterion that never stops: unlike generate(streamer=...), that sees every
+# step on all transformers versions. Streaming calls run their own generate
+# and don't join cross-session batches.
+
+_STREAM_END = object()
+
+
+class _AudioStreamer(StoppingCriteria):
+    """Queues newly decoded audio as (num_variations, samples) arrays while generate runs."""
+
+    def __init__(self, model, play_steps):
+        self.decoder = model.decoder
+        self.audio_encoder = model.audio_encoder
+        self.generation_config = model.generation_config
+        self.play_steps = play_steps
+        # The last `stride` samples of each decode still change as more tokens arrive, so hold them back
+        hop_length = int(np.prod(self.audio_encoder.config.upsampling_ratios))
+        self.stride = hop_length * max(play_steps - self.decoder.num_codebooks, 1) // 6
+        self.emitted = 0
+        self.chunks = queue.Queue()
+
+    @torch.no_grad()
+    def _decode(self, codes):
+        _, delay_mask = self.decoder.build_delay_pattern_mask(
+            codes[:, :1],
+            pad_token_id=self.generation_config.decoder_start_token_id,
+            max_length=codes.shape[-1],
+        )
+        codes = self.decoder.apply_delay_pattern_mask(codes, delay_mask)
+        batch_size = codes.shape[0] // self.decoder.num_codebooks
+        codes = codes[codes != self.generation_config.pad_token_id].reshape(batch_size, self.decoder.num_codebooks, -1)
+        if codes.shape[-1] == 0:
+            return np.zeros((batch_size, 0), dtype=np.float32)
+        audio = self.audio_encoder.decode(codes[None, ...], audio_scales=[None] * batch_size).audio_values
+        return audio[:, 0].cpu().float().numpy()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if input_ids.shape[-1] % self.play_steps == 0:
+            audio = self._decode(input_ids)
+            end = audio.shape[-1] - self.stride
+            if end > self.emitted:
+                self.chunks.put(audio[:, self.emitted:end])
+                self.emitted = end
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    def finish(self, audio_values):
+        """Queue the rest of generate's own final decode, then end the stream."""
+        audio = audio_values[:, 0].cpu().float().numpy()
+        if audio.shape[-1] > self.emitted:
+            self.chunks.put(audio[:, self.emitted:])
+        self.chunks.put(_STREAM_END)
+
+    def fail(self, error):
+        self.chunks.put(error)
+        self.chunks.put(_STREAM_END)
+
+    def __iter__(self):
+        while True:
+            item = self.chunks.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def generate_music_stream(prompt, num_variations=2, max_new_tokens=128, play_steps=None, seed=None):
+    """Yield audio for all variations as it is generated.
+
+    Each item is a float32 array of shape (num_variations, samples) holding
+    the samples that follow the previous item; concatenate them along the
+    last axis for the full track. The sample rate is get_sample_rate().
+    """
+    model, processor = _load_model()
+    inputs = processor(text=_variation_prompts(prompt, num_variations), padding=True, return_tensors="pt")
+    streamer = _AudioStreamer(model, play_steps or MUSICGEN_STREAM_STEPS)
+
+    def run():
+        try:
+            if seed is not None:
+                torch.manual_seed(seed)
+            audio_values = _generate(
+                model, **inputs, max_new_tokens=max_new_tokens, stopping_criteria=StoppingCriteriaList([streamer]),
+            )
+        except Exception as e:
+            streamer.fail(e)
+        else:
+            streamer.finish(audio_values)
+
+    threading.Thread(target=run, name="musicgen-stream", daemon=True).start()
+    yield from streamer
+
+
+def stream_music(prompt, num_variations=2, max_new_tokens=128, on_audio=None, seed=None):
+    """Like generate_music, but streams: on_audio(wav_bytes, seconds) receives variation A so far after each chunk.
+
+    Returns the list of wav byte buffers once generation finishes. Shares
+    generate_music's cache; a hit calls on_audio once with the whole track.
+    Long tracks report after each window rather than each chunk.
+    """
+    keys = _cache_keys(prompt, num_variations, max_new_tokens, seed)
+    results = _cached(keys)
+    if results is not None:
+        if on_audio:
+            sample_rate, first = scipy.io.wavfile.read(io.BytesIO(results[0]))
+            on_audio(results[0], len(first) / sample_rate)
+        return results
+    sample_rate = get_sample_rate()
+    if max_new_tokens > MUSICGEN_WINDOW_TOKENS:
+        def report(audio):
+            if on_audio:
+                on_audio(_to_wav_bytes(audio[0], sample_rate), audio.shape[-1] / sample_rate)
+
+        audio = generate_long_audio(prompt, num_variations, max_new_tokens, seed, on_window=report)
+        results = [_to_wav_bytes(row, sample_rate) for row in audio]
+        for key, wav in zip(keys, results):
+            audio_cache.put(key, wav)
+        return results
+    chunks = []
+    for chunk in generate_music_stream(prompt, num_variations, max_new_tokens, seed=seed):
+        chunks.append(chunk)
+        if on_audio:
+            first = np.concatenate([c[0] for c in chunks])
+            on_audio(_to_wav_bytes(first, sample_rate), len(first) / sample_rate)
+    audio = np.concatenate(chunks, axis=-1) if chunks else np.zeros((num_variations, 0), dtype=np.float32)
+    results = [_to_wav_bytes(row, sample_rate) for row in audio]
+    for key, wav in zip(keys, results):
+        audio_cache.put(key, wav)
+    return results
+
+
+def get_sample_rate():
+    model, _ = _load_model()
+    return model.config.audio_encoder.sampling_rate
+
+
 if __name__ == "__main__":
     test_prompt = "A gentle lo-fi piano melody with warm vinyl crackle and soft drums"
     print(f"Testing with prompt: {test_prompt}")
@@ -0,0 +1,112 @@
+from utils.dag import PROGRESS, Stage, run_dag
+from modules.text_analyzer import analyze_text
+from modules.image_analyzer import analyze_image
+from modules.voice_analyzer import analyze_voice
+from modules.emotion_fuser import fuse_emotions, analyze_and_fuse
+from modules.music_orchestrator import create_music_prompt
+from modules.music_generator import generate_music, stream_music
+from modules.explainer import explain_music
+from modules.feedback import preload_knowledge
+
+
+def apply_overrides(ai_profile, sliders, slider_defaults):
+    """Use slider values the user moved away from their defaults. Returns (final_profile, overrides)."""
+    final_profile = dict(ai_profile)
+    overrides = []
+    for dim, slider_val in sliders.items():
+        ai_val = ai_profile.get(dim, 50)
+        if slider_val != slider_defaults.get(dim, 50):
+            final_profile[dim] = slider_val
+            overrides.append(dim)
+        else:
+            final_profile[dim] = ai_val
+    final_profile["overrides"] = overrides
+    return final_profile, overrides
+
+
+def generate_stages(text=None, image_bytes=None, voice_bytes=None, transcript=None, fused=False, stream=False):
+    """Declare the Generate flow as a DAG.
+
+    Knowledge caches warm while inputs are analyzed, and explain_music runs
+    alongside generate_music since it only needs the music prompt. With
+    stream=True the music stage reports {"audio", "seconds"} progress
+    payloads holding variation A so far.
+    Expects run inputs: sliders, slider_defaults, max_new_tokens, seed.
+    """
+    stages = [Stage("knowledge", preload_knowledge, label="Loading what I've learned")]
+
+    if fused:
+        stages.append(Stage(
+            "analysis",
+            lambda: analyze_and_fuse(text=text, image_bytes=image_bytes, transcript=transcript),
+            outputs=("mood_list", "ai_profile"),
+            label="Analyzing your inputs",
+        ))
+    else:
+        mood_stages = []
+        if text:
+            mood_stages.append(Stage("text_mood", lambda: analyze_text(text), label="Reading your text"))
+        if image_bytes is not None:
+            mood_stages.append(Stage("image_mood", lambda: analyze_image(image_bytes), label="Looking at your image"))
+        if voice_bytes is not None:
+            mood_stages.append(Stage("voice_mood", lambda: analyze_voice(voice_bytes), label="Listening to your voice"))
+        mood_names = [s.name for s in mood_stages]
+        stages += mood_stages
+        stages.append(Stage("mood_list", lambda **moods: [moods[n] for n in mood_names], inputs=mood_names))
+        stages.append(Stage("ai_profile", fuse_emotions, inputs=["mood_list"], label="Building emotional profile"))
+
+    stages += [
+        Stage(
+            "final_profile", apply_overrides,
+            inputs=["ai_profile", "sliders", "slider_defaults"],
+            outputs=("final_profile", "overrides"),
+        ),
+        Stage(
+            "music_prompt", lambda final_profile, knowledge: create_music_prompt(final_profile),
+            inputs=["final_profile", "knowledge"],
+            label="Composing your soundtrack",
+        ),
+        _music_stage(stream),
+        Stage(
+            "explanation",
+            lambda ai_profile, final_profile, overrides, music_prompt: explain_music(
+                text or "", ai_profile, final_profile, overrides, music_prompt
+            ),
+            inputs=["ai_profile", "final_profile", "overrides", "music_prompt"],
+            label="Writing the story of your music",
+        ),
+    ]
+    return stages
+
+
+def _music_stage(stream):
+    if not stream:
+        return Stage(
+            "audio_list",
+            lambda music_prompt, max_new_tokens, seed: generate_music(
+                music_prompt, max_new_tokens=max_new_tokens, seed=seed
+            ),
+            inputs=["music_prompt", "max_new_tokens", "seed"],
+            label="Generating music",
+        )
+    return Stage(
+        "audio_list",
+        lambda music_prompt, max_new_tokens, seed, progress: stream_music(
+            music_prompt, max_new_tokens=max_new_tokens, seed=seed,
+            on_audio=lambda wav, seconds: progress({"audio": wav, "seconds": seconds}),
+        ),
+        inputs=["music_prompt", "max_new_tokens", "seed", PROGRESS],
+        label="Generating music",
+    )
+
+
+def run_generate(sliders, slider_defaults, max_new_tokens, seed=None, on_start=None, on_done=None, on_progress=None,
+                 **sources):
+    """Run the Generate flow. Returns (values, timings); see utils.dag.run_dag."""
+    return run_dag(
+        generate_stages(**sources),
+        inputs={"sliders": sliders, "slider_defaults": slider_defaults, "max_new_tokens": max_new_tokens, "seed": seed},
+        on_start=on_start,
+        on_done=on_done,
+        on_progress=on_progress,
+    )
@@ -1,8 +1,29 @@
+import os
+from dotenv import load_dotenv
+from modules.text_lexicon import analyze_text_local
 from utils.llm_client import ask_json
 
+load_dotenv()
+
+# Local lexicon results at or above this confidence skip the LLM call (>1 disables)
+TEXT_LOCAL_MIN_CONFIDENCE = float(os.getenv("TEXT_LOCAL_MIN_CONFIDENCE", "0.75"))
+
 
 def analyze_text(text):
-    """Analyze text input and return mood dict."""
+    """Analyze text input and return mood dict.
+
+    Short, unambiguous texts ("I feel so happy!") are handled by the local
+    lexicon analyzer; anything it is unsure about goes to Gemini.
+    """
+    local = analyze_text_local(text)
+    if local["confidence"] >= TEXT_LOCAL_MIN_CONFIDENCE:
+        local["analyzer"] = "lexicon"
+        return local
+    return analyze_text_llm(text)
+
+
+def analyze_text_llm(text):
+    """Analyze text input with Gemini and return mood dict."""
     prompt = f"""Analyze the following text for its emotional content.
 Return ONLY a JSON object with these keys:
 - summary: one sentence summary
@@ -0,0 +1,223 @@
+import re
+import numpy as np
+
+# --- Emotion Lexicon ---
+#
+# Local, dependency-free mood analysis for short texts. Each emotion has an
+# arousal (used for energy) and a list of words with strengths (0-1).
+
+_EMOTIONS = {
+    # emotion: (arousal, {word: strength})
+    "happy": (0.65, {
+        "happy": 1.0, "happier": 1.0, "happiest": 1.0, "happiness": 1.0, "glad": 0.9, "joy": 1.0,
+        "joyful": 1.0, "cheerful": 0.9, "delighted": 1.0, "pleased": 0.7, "great": 0.6, "good": 0.5,
+        "wonderful": 0.8, "amazing": 0.7, "awesome": 0.7, "fantastic": 0.8, "fun": 0.6, "smile": 0.7,
+        "smiling": 0.7, "laugh": 0.7, "laughing": 0.7, "yay": 0.8, "lovely": 0.6, "blessed": 0.6,
+    }),
+    "excited": (0.9, {
+        "excited": 1.0, "exciting": 0.9, "thrilled": 1.0, "pumped": 0.9, "hyped": 0.9, "ecstatic": 1.0,
+        "elated": 0.9, "eager": 0.7, "cant-wait": 0.9, "stoked": 0.9, "energetic": 0.8, "alive": 0.6,
+    }),
+    "grateful": (0.35, {
+        "grateful": 1.0, "thankful": 1.0, "thanks": 0.6, "appreciate": 0.8, "appreciative": 0.9,
+        "gratitude": 1.0, "lucky": 0.6, "fortunate": 0.7,
+    }),
+    "hopeful": (0.5, {
+        "hopeful": 1.0, "hope": 0.8, "hoping": 0.8, "optimistic": 1.0, "looking-forward": 0.8,
+        "better": 0.4, "brighter": 0.6, "believe": 0.4, "wish": 0.5,
+    }),
+    "peaceful": (0.15, {
+        "peaceful": 1.0, "peace": 0.9, "serene": 1.0, "tranquil": 1.0, "content": 0.7, "still": 0.4,
+        "quiet": 0.5, "gentle": 0.5, "soothing": 0.8,
+    }),
+    "calm": (0.2, {
+        "calm": 1.0, "relaxed": 1.0, "relaxing": 0.9, "chill": 0.8, "mellow": 0.8, "easy": 0.4,
+        "rested": 0.6, "cozy": 0.7, "comfortable": 0.6,
+    }),
+    "nostalgic": (0.35, {
+        "nostalgic": 1.0, "nostalgia": 1.0, "remember": 0.6, "remembering": 0.6, "memories": 0.7,
+        "memory": 0.6, "childhood": 0.7, "reminisce": 0.9, "reminiscing": 0.9, "used-to": 0.5, "old": 0.3,
+    }),
+    "melancholic": (0.3, {
+        "melancholic": 1.0, "melancholy": 1.0, "bittersweet": 0.9, "wistful": 0.9, "gloomy": 0.8,
+        "blue": 0.5, "somber": 0.9, "sombre": 0.9, "pensive": 0.6, "rain": 0.3, "rainy": 0.4, "grey": 0.3,
+    }),
+    "sad": (0.25, {
+        "sad": 1.0, "sadder": 1.0, "sadness": 1.0, "unhappy": 1.0, "depressed": 1.0, "down": 0.5,
+        "crying": 0.9, "cry": 0.8, "cried": 0.8, "tears": 0.8, "heartbroken": 1.0, "grief": 1.0,
+        "grieving": 1.0, "miserable": 1.0, "hurt": 0.7, "loss": 0.7, "lost": 0.5, "upset": 0.7, "awful": 0.6,
+    }),
+    "lonely": (0.25, {
+        "lonely": 1.0, "alone": 0.8, "loneliness": 1.0, "isolated": 0.9, "missing": 0.7, "miss": 0.6,
+        "abandoned": 0.9, "empty": 0.7,
+    }),
+    "anxious": (0.7, {
+        "anxious": 1.0, "anxiety": 1.0, "nervous": 1.0, "worried": 1.0, "worry": 0.9, "worrying": 0.9,
+        "scared": 0.9, "afraid": 0.9, "fear": 0.9, "panic": 1.0, "stressed": 0.9, "stress": 0.8,
+        "tense": 0.8, "overwhelmed": 0.9, "uneasy": 0.8, "restless": 0.7,
+    }),
+    "angry": (0.9, {
+        "angry": 1.0, "anger": 1.0, "mad": 0.8, "furious": 1.0, "rage": 1.0, "hate": 0.9, "pissed": 0.9,
+        "livid": 1.0, "outraged": 1.0, "resent": 0.8,
+    }),
+    "frustrated": (0.75, {
+        "frustrated": 1.0, "frustrating": 0.9, "annoyed": 0.9, "annoying": 0.8, "irritated": 0.9,
+        "fed-up": 1.0, "stuck": 0.6, "ugh": 0.7, "tired-of": 0.8, "sick-of": 0.9, "bored-of": 0.7,
+        "done-with": 0.6,
+    }),
+    "tired": (0.1, {
+        "tired": 0.9, "exhausted": 1.0, "sleepy": 0.9, "drained": 0.9, "weary": 0.9, "burnt": 0.7,
+        "burned": 0.6, "fatigued": 1.0,
+    }),
+    "romantic": (0.4, {
+        "love": 0.8, "loving": 0.8, "romantic": 1.0, "crush": 0.8, "adore": 0.9, "darling": 0.7,
+        "sweetheart": 0.8, "date": 0.4, "kiss": 0.8,
+    }),
+    "confident": (0.7, {
+        "confident": 1.0, "proud": 0.9, "strong": 0.6, "powerful": 0.8, "unstoppable": 1.0,
+        "determined": 0.9, "motivated": 0.8, "ready": 0.5,
+    }),
+}
+
+# Two-word phrases are joined before lookup so they can carry their own entries
+_PHRASES = {("cant", "wait"): "cant-wait", ("looking", "forward"): "looking-forward",
+            ("used", "to"): "used-to", ("fed", "up"): "fed-up", ("tired", "of"): "tired-of",
+            ("sick", "of"): "sick-of", ("bored", "of"): "bored-of", ("done", "with"): "done-with"}
+
+_INTENSIFIERS = {
+    "very": 1.5, "so": 1.4, "really": 1.4, "extremely": 1.8, "super": 1.5, "incredibly": 1.7,
+    "totally": 1.3, "completely": 1.4, "absolutely": 1.6, "too": 1.3, "deeply": 1.5, "truly": 1.3,
+    "slightly": 0.6, "somewhat": 0.6, "kinda": 0.6, "kind": 0.7, "bit": 0.6, "little": 0.6, "mildly": 0.6,
+}
+_NEGATORS = {"not", "no", "never", "without", "hardly", "barely", "nothing", "nobody", "neither", "nor",
+             "cannot", "dont", "didnt", "doesnt", "isnt", "wasnt", "arent", "werent", "aint", "wont", "cant",
+             "wouldnt", "couldnt", "shouldnt", "havent", "hasnt", "hadnt", "neednt", "mustnt", "mightnt"}
+_CONTRASTS = {"but", "although", "though", "yet", "however", "despite", "except"}
+# "Tired of being happy" is about the frame, not the mood after it: treated like a negator
+_NEGATIVE_FRAMES = {"tired-of", "sick-of", "fed-up", "bored-of", "done-with"}
+# Words an intensifier looks past to reach its mood word ("kind of sad", "so very happy")
+_STOPWORDS = {"a", "an", "the", "of", "to", "i", "im", "am", "is", "are", "was", "were", "be", "being", "been",
+              "feel", "feeling", "feels", "felt", "it", "its", "this", "that", "just", "me", "my", "get", "getting"}
+_NEGATION_SCOPE = 3  # Content words (not stopwords or intensifiers) after a negator that it applies to, same clause
+_MULTIPLIER_RANGE = (0.5, 2.0)  # Bounds for stacked intensifiers ("a little bit", "so very")
+
+_EMOTION_NAMES = list(_EMOTIONS)
+_AROUSAL = np.array([_EMOTIONS[e][0] for e in _EMOTION_NAMES])
+_VOCAB = {  # word -> (emotion index, strength)
+    word: (i, strength)
+    for i, name in enumerate(_EMOTION_NAMES)
+    for word, strength in _EMOTIONS[name][1].items()
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z']+|[.!?;,]")
+_APOSTROPHES = str.maketrans({"\u2019": "'", "\u2018": "'"})
+
+
+def _tokenize(text):
+    """Lowercase word and clause-punctuation tokens, with apostrophes and known phrases folded."""
+    raw = _TOKEN_RE.findall(text.translate(_APOSTROPHES))
+    shouting = sum(1 for t in raw if len(t) > 2 and t.isupper())
+    tokens = [t.lower().replace("'", "") for t in raw]
+    # Any other "n't" contraction ("oughtn't", "usedn't") is still a negator once its apostrophe is gone
+    tokens = ["not" if r.lower().endswith("n't") and t not in _NEGATORS else t for r, t in zip(raw, tokens)]
+    merged = []
+    i = 0
+    while i < len(tokens):
+        phrase = _PHRASES.get(tuple(tokens[i:i + 2]))
+        if phrase:
+            merged.append(phrase)
+            i += 2
+        else:
+            merged.append(tokens[i])
+            i += 1
+    return merged, shouting
+
+
+def analyze_text_local(text):
+    """Lexicon-based mood analysis. Returns the analyze_text dict plus confidence.
+
+    Handles intensifiers ("so happy", "kind of sad"), negation and negative
+    frames ("not happy", "tired of being happy" drop the mood word) and
+    exclamation/shouting for energy. confidence (0-1) is high for short texts
+    with clear, unnegated emotion words and low for negated, contrasting
+    ("sad but...") or emotion-sparse text, where an LLM reads nuance better.
+    """
+    tokens, shouting = _tokenize(text)
+    n = len(tokens)
+    if not n:
+        return _neutral(0.0)
+
+    lookup = [_VOCAB.get(t, (-1, 0.0)) for t in tokens]
+    emotion_idx = np.fromiter((e for e, _ in lookup), dtype=np.int64, count=n)
+    strength = np.fromiter((s for _, s in lookup), dtype=np.float64, count=n)
+    positions = np.arange(n)
+    is_punct = np.fromiter((t in ".!?;," for t in tokens), dtype=bool, count=n)
+    is_negator = np.fromiter((t in _NEGATORS or t in _NEGATIVE_FRAMES for t in tokens), dtype=bool, count=n)
+    is_intensifier = np.fromiter((t in _INTENSIFIERS for t in tokens), dtype=bool, count=n)
+    is_stop = np.fromiter((t in _STOPWORDS for t in tokens), dtype=bool, count=n)
+    intensity = np.fromiter((_INTENSIFIERS.get(t, 1.0) for t in tokens), dtype=np.float64, count=n)
+
+    # Each intensifier scales the next word that isn't a stopword or another intensifier
+    skippable = (is_stop | is_intensifier) & ~is_punct
+    next_word = np.where(~skippable, positions, n)
+    next_word = np.minimum.accumulate(next_word[::-1])[::-1]  # Closest non-skippable token at or after i
+    target = np.concatenate((next_word[1:], [n]))  # ... strictly after i
+    multiplier = np.ones(n + 1)
+    np.multiply.at(multiplier, target[is_intensifier], intensity[is_intensifier])
+    multiplier = np.clip(multiplier[:n], *_MULTIPLIER_RANGE)
+    # Closest negator before each token, how many content words lie between them, and whether same clause
+    clause = np.cumsum(is_punct)
+    content = np.cumsum(~skippable & ~is_punct & ~is_negator)  # Content words up to and including i
+    last_negator = np.maximum.accumulate(np.where(is_negator, positions, -1))
+    last_negator = np.concatenate(([-1], last_negator[:-1]))
+    anchor = np.maximum(last_negator, 0)
+    between = np.concatenate(([0], content[:-1])) - content[anchor]
+    negated = (last_negator >= 0) & (between < _NEGATION_SCOPE) & (clause[anchor] == clause)
+
+    is_emotion = emotion_idx >= 0
+    counted = is_emotion & ~negated
+    weights = np.where(counted, strength * multiplier, 0.0)
+    scores = np.bincount(np.where(counted, emotion_idx, 0), weights=weights, minlength=len(_EMOTION_NAMES))
+
+    total = scores.sum()
+    if total <= 0:
+        return _neutral(0.3 if (is_emotion & negated).any() else 0.0)
+
+    # Strongest emotion first; ties go to the one mentioned first
+    first_seen = np.full(len(_EMOTION_NAMES), n)
+    np.minimum.at(first_seen, emotion_idx[counted], positions[counted])
+    order = np.lexsort((first_seen, -scores))
+    moods = [_EMOTION_NAMES[i] for i in order[:3] if scores[i] >= 0.3 * scores[order[0]]]
+
+    exclamations = tokens.count("!")
+    energy = float(_AROUSAL @ scores / total)
+    energy += 0.05 * min(exclamations, 3) + 0.05 * min(shouting, 2)
+    energy += 0.1 * (float(weights.max()) - 1.0) if weights.max() > 1.0 else 0.0
+    energy = round(float(np.clip(energy, 0.0, 1.0)), 2)
+
+    words = int((~is_punct).sum())
+    hits = int(counted.sum())
+    confidence = 1 - np.exp(-total / 0.6)  # One clear emotion word ~0.8, two ~0.96
+    confidence *= min(1.0, 0.5 + 5 * hits / max(words, 1))  # Long text with few emotion words
+    if (is_emotion & negated).any():
+        confidence *= 0.5
+    if len(moods) > 1 and any(t in _CONTRASTS for t in tokens):
+        confidence *= 0.7
+
+    return {
+        "summary": f"The writer sounds {_join_words(moods)}.",
+        "moods": moods,
+        "mood": moods[0],
+        "energy": energy,
+        "source": "text",
+        "confidence": round(float(confidence), 3),
+    }
+
+
+def _join_words(words):
+    return words[0] if len(words) == 1 else f"{', '.join(words[:-1])} and {words[-1]}"
+
+
+def _neutral(confidence):
+    return {"summary": "No clear emotion words found.", "moods": ["neutral"], "mood": "neutral",
+            "energy": 0.5, "source": "text", "confidence": confidence}
@@ -1,17 +1,27 @@
 import tempfile
+import threading
+import numpy as np
 import whisper
 from utils.llm_client import ask_json
 
 _whisper_model = None
+_load_lock = threading.Lock()  # Warmup and a first request may race to load
 
 
 def _get_whisper():
     global _whisper_model
     if _whisper_model is None:
-        _whisper_model = whisper.load_model("base")
+        with _load_lock:
+            if _whisper_model is None:
+                _whisper_model = whisper.load_model("base")
     return _whisper_model
 
 
+def warmup():
+    """Load Whisper and transcribe one second of silence so the first request pays no cold start."""
+    _get_whisper().transcribe(np.zeros(whisper.audio.SAMPLE_RATE, dtype=np.float32))
+
+
 def transcribe_audio(audio_bytes):
     """Transcribe audio bytes with Whisper. Returns the transcript string."""
     model = _get_whisper()
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+# Components to warm, in order; MusicGen first since every request needs it
+WARMUP_COMPONENTS = [c.strip() for c in os.getenv("WARMUP_COMPONENTS", "knowledge,musicgen,whisper").split(",") if c.strip()]
+
+# --- Background Warmup ---
+#
+# MusicGen and Whisper load lazily and their first forward pass is slow, so a
+# single daemon thread loads each one at startup and runs a tiny dummy
+# generation/transcription. Requests that arrive meanwhile simply wait on the
+# model's load lock instead of loading a second copy.
+
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+_warmup_status = {}  # component -> {"state", "seconds", "error"}
+
+
+def _warm_knowledge():
+    from modules.feedback import preload_knowledge
+    preload_knowledge()
+
+
+def _warm_musicgen():
+    from modules.music_generator import warmup
+    warmup()
+
+
+def _warm_whisper():
+    from modules.voice_analyzer import warmup
+    warmup()
+
+
+_WARMERS = {"knowledge": _warm_knowledge, "musicgen": _warm_musicgen, "whisper": _warm_whisper}
+
+
+def _set_status(component, **fields):
+    with _warmup_lock:
+        _warmup_status[component].update(fields)
+
+
+def _run_warmup(components):
+    for component in components:
+        _set_status(component, state="loading")
+        start = time.monotonic()
+        try:
+            _WARMERS[component]()
+        except Exception as e:
+            _set_status(component, state="failed", error=str(e), seconds=round(time.monotonic() - start, 1))
+            continue
+        _set_status(component, state="ready", seconds=round(time.monotonic() - start, 1))
+
+
+def start_warmup(components=None):
+    """Start warming models on a daemon thread. Safe to call on every app rerun.
+
+    Returns False if warmup is disabled or already started.
+    """
+    global _warmup_thread
+    components = components or WARMUP_COMPONENTS
+    unknown = [c for c in components if c not in _WARMERS]
+    if unknown:
+        raise ValueError(f"Unknown warmup components: {unknown} (expected some of {list(_WARMERS)})")
+    with _warmup_lock:
+        if not WARMUP_ENABLED or _warmup_thread is not None:
+            return False
+        for component in components:
+            _warmup_status[component] = {"state": "pending", "seconds": None, "error": None}
+        _warmup_thread = threading.Thread(target=_run_warmup, args=(components,), name="model-warmup", daemon=True)
+        _warmup_thread.start()
+    return True
+
+
+def get_readiness():
+    """Return {"ready": bool, "components": {name: {"state", "seconds", "error"}}}.
+
+    ready is True once every component has finished warming (or failed; a
+    failed component falls back to loading on first use). It is also True
+    when warmup is disabled or was never started.
+    """
+    with _warmup_lock:
+        components = {name: dict(status) for name, status in _warmup_status.items()}
+    ready = all(s["state"] in ("ready", "failed") for s in components.values())
+    return {"ready": ready, "components": components}
+
+
+def wait_for_warmup(timeout=None):
+    """Block until warmup finishes (for scripts and tests). Returns get_readiness()."""
+    thread = _warmup_thread
+    if thread is not None:
+        thread.join(timeout)
+    return get_readiness()
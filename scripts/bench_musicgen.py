@@ -0,0 +1,108 @@
+"""Compare MusicGen CPU inference modes.
+
+Runs a fixed prompt set through generate_music once per mode, each in a
+fresh subprocess so load cost and peak memory are measured in isolation,
+and reports load time, first-call time (includes torch.compile), decoder
+tokens/sec, real-time factor (generation seconds per second of audio; below
+1 is faster than real time) and peak RSS. The audio cache and cross-session
+batching are disabled; every prompt is an A/B pair, as in the app.
+
+    python scripts/bench_musicgen.py --modes fp32 int8 bf16 int8,compile --threads 8 --tokens 250
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PROMPTS = [
+    "A gentle lo-fi piano melody with warm vinyl crackle and soft drums",
+    "Uplifting cinematic strings building to a bright, triumphant brass swell",
+    "Slow ambient synth pads over a distant rain texture, calm and spacious",
+    "Upbeat funky bassline with crisp hi-hats and playful electric guitar",
+]
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # Bytes on macOS, KB on Linux
+
+
+def run_mode(tokens, repeats):
+    """Benchmark the mode configured in this process's environment. Returns a result dict."""
+    import scipy.io.wavfile
+    from modules import music_generator
+
+    start = time.perf_counter()
+    music_generator.get_sample_rate()  # Loads the model and applies the inference modes
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    music_generator.generate_music(PROMPTS[0], max_new_tokens=tokens, seed=0)
+    first_seconds = time.perf_counter() - start
+
+    seconds, audio_seconds, rows = 0.0, 0.0, 0
+    for _ in range(repeats):
+        for i, prompt in enumerate(PROMPTS):
+            start = time.perf_counter()
+            wavs = music_generator.generate_music(prompt, max_new_tokens=tokens, seed=i)
+            seconds += time.perf_counter() - start
+            sample_rate, audio = scipy.io.wavfile.read(io.BytesIO(wavs[0]))
+            audio_seconds += len(audio) / sample_rate
+            rows += len(wavs)
+    return {
+        "modes": music_generator._active_modes(),
+        "threads": music_generator.torch.get_num_threads(),
+        "load_s": round(load_seconds, 2),
+        "first_call_s": round(first_seconds, 2),
+        "tokens_per_s": round(rows * tokens / seconds, 1),
+        "rtf": round(seconds / audio_seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8", "bf16", "compile"],
+                        help="MUSICGEN_INFERENCE values to compare; fp32 = none, combine with commas")
+    parser.add_argument("--threads", type=int, default=0, help="MUSICGEN_THREADS (0 = torch default)")
+    parser.add_argument("--tokens", type=int, default=250, help="max_new_tokens per prompt (250 = 5 sec)")
+    parser.add_argument("--repeats", type=int, default=1, help="passes over the prompt set")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.tokens, args.repeats)))
+        return
+
+    results = {}
+    for mode in args.modes:
+        env = dict(os.environ, MUSICGEN_INFERENCE="" if mode == "fp32" else mode, MUSICGEN_THREADS=str(args.threads),
+                   AUDIO_CACHE_ENABLED="0", MUSICGEN_BATCHING="0", WARMUP_ENABLED="0")
+        cmd = [sys.executable, __file__, "--worker", "--tokens", str(args.tokens), "--repeats", str(args.repeats)]
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{mode}: failed\n{proc.stderr.strip()[-2000:]}")
+            continue
+        results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode}: done")
+
+    print(f"\n{len(PROMPTS) * args.repeats} A/B prompts x {args.tokens} tokens per mode")
+    print(f"{'mode':<16} {'active':<16} {'threads':>7} {'load s':>7} {'1st s':>7} {'tok/s':>8} {'RTF':>7} {'RSS MB':>7}")
+    for mode, r in results.items():
+        active = ",".join(r["modes"]) or "fp32"
+        print(f"{mode:<16} {active:<16} {r['threads']:>7} {r['load_s']:>7} {r['first_call_s']:>7} "
+              f"{r['tokens_per_s']:>8} {r['rtf']:>7} {r['peak_rss_mb']:>7}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
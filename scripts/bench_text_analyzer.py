@@ -0,0 +1,126 @@
+"""Compare the local lexicon text analyzer with the LLM path.
+
+Runs every text through analyze_text_local and analyze_text_llm and reports
+latency for both, how often the local top mood agrees with the LLM, and how
+much of the corpus the local tier would answer on its own at the configured
+TEXT_LOCAL_MIN_CONFIDENCE. Uses the LLM backend from LLM_BACKEND (set
+LLM_BACKEND=fake to try it offline; agreement is then meaningless).
+
+    python scripts/bench_text_analyzer.py --file my_texts.txt --concurrency 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")  # Measure the backend, not the cache
+
+from modules.text_analyzer import TEXT_LOCAL_MIN_CONFIDENCE, analyze_text_llm  # noqa: E402
+from modules.text_lexicon import analyze_text_local  # noqa: E402
+
+SAMPLE_TEXTS = [
+    "I feel happy",
+    "I'm so happy today!!",
+    "Everything is calm, the rain is peaceful",
+    "So excited for the trip!",
+    "I can't wait for tomorrow",
+    "Angry at how the day went",
+    "Lonely evening, missing old friends",
+    "I'm really anxious about my exam tomorrow",
+    "Feeling grateful for my family",
+    "I'm exhausted after a long week",
+    "Annoyed that the train was late again",
+    "Remembering summers at my grandparents' house",
+    "I'm hopeful things will get better",
+    "Heartbroken, I just want to cry",
+    "Relaxed and cozy with a cup of tea",
+    "I'm proud of what we built",
+    "I'm in love and everything feels light",
+    "Gloomy grey sky, kind of wistful",
+    "I'm sad but grateful for the memories",
+    "Not happy with how that meeting went",
+    "I don't feel anxious anymore, just tired",
+    "Nervous but thrilled about the new job",
+    "It was fine I guess",
+    "Went for a walk by the river after dinner",
+    "The city lights at midnight",
+    "I feel like I'm drifting between two lives",
+]
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))]
+
+
+def time_local(text, repeats):
+    """Return (result, seconds per call) for the local analyzer."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = analyze_text_local(text)
+    return result, (time.perf_counter() - start) / repeats
+
+
+def time_llm(text):
+    """Return (result or None, seconds, error or None) for the LLM analyzer."""
+    start = time.monotonic()
+    try:
+        return analyze_text_llm(text), time.monotonic() - start, None
+    except Exception as e:
+        return None, time.monotonic() - start, e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="texts to analyze, one per line (default: built-in samples)")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel LLM calls")
+    parser.add_argument("--repeats", type=int, default=200, help="local runs per text for timing")
+    parser.add_argument("--threshold", type=float, default=TEXT_LOCAL_MIN_CONFIDENCE)
+    parser.add_argument("--verbose", action="store_true", help="print each text with both results")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+
+    local = [time_local(t, args.repeats) for t in texts]
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        llm = list(executor.map(time_llm, texts))
+
+    pairs = [(text, lr, r) for text, (lr, _), (r, _, err) in zip(texts, local, llm) if err is None]
+    confident = [(text, lr, r) for text, lr, r in pairs if lr["confidence"] >= args.threshold]
+
+    def agreement(rows):
+        top = sum(lr["mood"].lower() == str(r.get("mood", "")).lower() for _, lr, r in rows)
+        overlap = sum(lr["mood"].lower() in [str(m).lower() for m in r.get("moods", [])] for _, lr, r in rows)
+        energy = [abs(lr["energy"] - float(r.get("energy", 0.5))) for _, lr, r in rows]
+        n = max(len(rows), 1)
+        return top / n, overlap / n, sum(energy) / n
+
+    local_times = sorted(t for _, t in local)
+    llm_times = sorted(t for _, t, err in llm if err is None)
+    errors = [err for _, _, err in llm if err is not None]
+    print(f"texts:              {len(texts)} ({len(errors)} LLM errors)")
+    print(f"local latency:      p50 {percentile(local_times, 0.5) * 1e6:.0f}us  p99 {percentile(local_times, 0.99) * 1e6:.0f}us")
+    print(f"LLM latency:        p50 {percentile(llm_times, 0.5):.2f}s  p95 {percentile(llm_times, 0.95):.2f}s")
+    top, overlap, energy = agreement(pairs)
+    print(f"all texts:          top mood match {top:.0%}, local mood in LLM moods {overlap:.0%}, energy MAE {energy:.2f}")
+    top, overlap, energy = agreement(confident)
+    print(f"confident (>={args.threshold:.2f}): {len(confident)}/{len(pairs)} texts would skip the LLM; "
+          f"top mood match {top:.0%}, in LLM moods {overlap:.0%}, energy MAE {energy:.2f}")
+    for err in errors[:5]:
+        print(f"  {type(err).__name__}: {err}")
+
+    if args.verbose:
+        for text, lr, r in pairs:
+            print(f"\n{text!r}\n  local {lr['confidence']:.2f} {lr['moods']} {lr['energy']}"
+                  f"\n  llm        {r.get('moods')} {r.get('energy')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Offline load test for the LLM half of the Generate pipeline.
+
+Runs analyze_text -> fuse_emotions -> create_music_prompt -> explain_music for
+many simulated sessions against the fake LLM backend and reports throughput,
+latency percentiles and per-call-site LLM metrics. MusicGen is not involved.
+
+    python scripts/load_test.py --sessions 200 --concurrency 16 --latency 0.8 --error-rate 0.02
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")  # Measure the backend, not the cache
+
+from utils import llm_client, llm_metrics  # noqa: E402
+from utils.llm_backends import FakeBackend  # noqa: E402
+from modules.text_analyzer import analyze_text  # noqa: E402
+from modules.emotion_fuser import fuse_emotions  # noqa: E402
+from modules.music_orchestrator import create_music_prompt  # noqa: E402
+from modules.explainer import explain_music  # noqa: E402
+
+SAMPLE_TEXTS = [
+    "I feel happy and a little nostalgic today",
+    "Everything is calm, the rain is peaceful",
+    "I'm anxious about tomorrow but hopeful",
+    "Angry at how the day went",
+    "Lonely evening, missing old friends",
+    "So excited for the trip!",
+]
+
+
+def run_session(i):
+    """Run one simulated Generate request. Returns (seconds, error or None)."""
+    start = time.monotonic()
+    try:
+        text = f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (session {i})"
+        mood = analyze_text(text)
+        ai_profile = fuse_emotions([mood])
+        final_profile = dict(ai_profile, overrides=[])
+        music_prompt = create_music_prompt(final_profile)
+        explain_music(text, ai_profile, final_profile, [], music_prompt)
+        return time.monotonic() - start, None
+    except Exception as e:
+        return time.monotonic() - start, e
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean fake LLM latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- latency jitter (s)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of very slow calls")
+    parser.add_argument("--tail-latency", type=float, default=5.0, help="extra seconds for slow calls")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls raising a 503")
+    parser.add_argument("--bad-json-rate", type=float, default=0.0, help="fraction of malformed JSON replies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    llm_client.set_backend(FakeBackend(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        bad_json_rate=args.bad_json_rate, tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency, seed=args.seed,
+    ))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run_session, range(args.sessions)))
+    wall = time.monotonic() - start
+
+    latencies = sorted(t for t, err in results if err is None)
+    errors = [err for _, err in results if err is not None]
+    print(f"sessions:    {args.sessions} (concurrency {args.concurrency})")
+    print(f"wall time:   {wall:.2f}s")
+    print(f"throughput:  {len(latencies) / wall:.2f} sessions/s")
+    print(f"latency p50: {percentile(latencies, 0.50):.2f}s")
+    print(f"latency p95: {percentile(latencies, 0.95):.2f}s")
+    print(f"latency p99: {percentile(latencies, 0.99):.2f}s")
+    print(f"errors:      {len(errors)}")
+    for err in errors[:5]:
+        print(f"  {type(err).__name__}: {err}")
+
+    snapshot = llm_metrics.export_metrics()
+    print(f"\nper call site (also written to {os.path.abspath(llm_metrics.METRICS_JSON_PATH)} and .prom):")
+    for site, m in sorted(snapshot["sites"].items(), key=lambda kv: -kv[1]["latency_sum"]):
+        p95 = f"<={m['latency_p95']}s" if m["latency_p95"] is not None else f">{llm_metrics.LATENCY_BUCKETS[-1]}s"
+        print(f"  {site:40s} calls {m['calls']:5d}  avg {m['latency_avg']:.2f}s  p95 {p95}  "
+              f"retries {m['retries']}  parse failures {m['parse_failures']}  errors {m['errors']}  "
+              f"~{m['prompt_tokens'] // max(m['calls'], 1)} prompt tokens/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Fill the generated-audio cache ahead of time.
+
+Generates every prompt (one per line in --file, or given as arguments) that
+isn't cached yet for the chosen duration and seed, so matching requests in
+the app return immediately. Prompts must match the music prompts the app
+sends exactly, e.g. ones collected from data/feedback.jsonl.
+
+    python scripts/prewarm_audio_cache.py --file prompts.txt --tokens 250 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.music_generator import prewarm_cache  # noqa: E402
+from utils import audio_cache  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("prompts", nargs="*", help="Music prompts to generate")
+    parser.add_argument("--file", help="Text file with one prompt per line")
+    parser.add_argument("--tokens", type=int, nargs="+", default=[250], help="max_new_tokens values (250 = 5 sec)")
+    parser.add_argument("--variations", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=None, help="Seed to cache under (default: the unseeded entry)")
+    args = parser.parse_args()
+
+    prompts = list(args.prompts)
+    if args.file:
+        with open(args.file) as f:
+            prompts += [line.strip() for line in f if line.strip()]
+    if not prompts:
+        parser.error("no prompts given")
+
+    for tokens in args.tokens:
+        start = time.perf_counter()
+        generated = prewarm_cache(prompts, num_variations=args.variations, max_new_tokens=tokens, seed=args.seed)
+        print(f"{tokens} tokens: generated {generated}, already cached {len(prompts) - generated} "
+              f"({time.perf_counter() - start:.1f}s)")
+    stats = audio_cache.get_stats()
+    print(f"Cache: {stats['entries']} files, {stats['megabytes']} MB")
+
+
+if __name__ == "__main__":
+    main()
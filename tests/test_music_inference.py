@@ -0,0 +1,22 @@
+import pytest
+import torch
+
+from modules.music_generator import _apply_inference_modes, _inference_context, _resolve_modes
+
+
+def test_int8_with_bf16_runs_a_forward_pass():
+    with pytest.warns(UserWarning, match="int8"):
+        modes = _resolve_modes(["int8", "bf16"])
+    assert modes == ["int8"]
+
+    model = torch.nn.Sequential(torch.nn.Linear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 8)).eval()
+    _apply_inference_modes(model, modes)
+    with torch.no_grad(), _inference_context(modes):
+        out = model(torch.randn(4, 16))
+    assert out.shape == (4, 8)
+    assert out.dtype == torch.float32
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        _resolve_modes(["fp8"])
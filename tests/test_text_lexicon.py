@@ -0,0 +1,41 @@
+from modules.text_lexicon import analyze_text_local
+
+
+def test_clear_mood_is_confident():
+    result = analyze_text_local("I'm so happy today!")
+    assert result["mood"] == "happy"
+    assert result["confidence"] >= 0.75
+
+
+def test_downtoner_reaches_mood_word_past_stopwords():
+    plain = analyze_text_local("sad")
+    softened = analyze_text_local("kind of sad")
+    assert softened["mood"] == "sad"
+    assert softened["confidence"] < plain["confidence"]
+
+
+def test_stacked_intensifiers_apply_to_mood_word():
+    assert analyze_text_local("so very happy")["confidence"] > analyze_text_local("very happy")["confidence"]
+
+
+def test_negation_drops_mood_word():
+    result = analyze_text_local("not happy")
+    assert result["mood"] == "neutral"
+    assert result["confidence"] < 0.75
+
+
+def test_nt_contractions_negate():
+    for text in ("I wouldn't say I'm happy", "I haven't been happy lately", "I couldn't be happier"):
+        result = analyze_text_local(text)
+        assert result["mood"] != "happy" or result["confidence"] < 0.75, text
+
+
+def test_negation_scope_skips_stopwords_and_intensifiers():
+    assert analyze_text_local("I'm not feeling very very happy")["confidence"] < 0.75
+
+
+def test_negative_frame_is_not_the_framed_mood():
+    for text in ("I'm tired of being happy", "sick of feeling lonely"):
+        result = analyze_text_local(text)
+        assert result["mood"] == "frustrated", text
+        assert result["confidence"] < 0.75, text  # Left to the LLM
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from dotenv import load_dotenv
+from utils.file_io import atomic_write_bytes
+
+load_dotenv()
+
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "1") != "0"
+AUDIO_CACHE_DIR = os.getenv(
+    "AUDIO_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "data", "audio_cache"),
+)
+AUDIO_CACHE_MAX_MB = float(os.getenv("AUDIO_CACHE_MAX_MB", "512"))  # Least recently used files go first
+
+# --- Content-Addressed Audio Cache ---
+#
+# Each generated variation is stored as <sha256>.wav, where the hash covers
+# everything that determines the audio (see audio_key). A file's mtime is
+# its last access, so eviction simply deletes the oldest files until the
+# directory fits in AUDIO_CACHE_MAX_MB. Several app processes can share one
+# directory: writes are atomic renames and a vanished file is just a miss.
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_size = None  # Bytes on disk, computed on first store
+
+
+def audio_key(model_id, prompt, suffix, batch_suffixes, max_new_tokens, params, seed):
+    """Hash one variation's generation inputs into a cache key.
+
+    batch_suffixes lists every variation generated alongside this one, since
+    the rows of a seeded batch draw from one random stream.
+    """
+    material = {
+        "model": model_id,
+        "prompt": prompt,
+        "suffix": suffix,
+        "batch": list(batch_suffixes),
+        "max_new_tokens": max_new_tokens,
+        "params": params,
+        "seed": seed,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+
+def _path(key):
+    return os.path.join(os.path.abspath(AUDIO_CACHE_DIR), key[:2], key + ".wav")
+
+
+def get(key):
+    """Return cached wav bytes for key, or None on a miss."""
+    if not AUDIO_CACHE_ENABLED:
+        return None
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # Mark as recently used
+    except OSError:
+        data = None
+    with _lock:
+        _stats["hits" if data is not None else "misses"] += 1
+    return data
+
+
+def put(key, wav_bytes):
+    """Store wav bytes under key, then evict old entries past AUDIO_CACHE_MAX_MB."""
+    global _size
+    if not AUDIO_CACHE_ENABLED:
+        return
+    path = _path(key)
+    try:
+        existed = os.path.exists(path)
+        atomic_write_bytes(path, wav_bytes)
+    except OSError:
+        return  # A broken disk cache only costs a regeneration
+    with _lock:
+        _stats["stores"] += 1
+        if _size is not None and not existed:
+            _size += len(wav_bytes)
+        if _size is None or _size > AUDIO_CACHE_MAX_MB * 1024 * 1024:
+            _evict()
+
+
+def _entries():
+    """Return [(mtime, size, path)] for every cached file."""
+    root = os.path.abspath(AUDIO_CACHE_DIR)
+    entries = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(".wav"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def _evict():
+    """Rescan the directory (other processes may share it) and drop LRU files until it fits. Needs _lock."""
+    global _size
+    entries = sorted(_entries())
+    _size = sum(size for _, size, _ in entries)
+    limit = AUDIO_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in entries:
+        if _size <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _size -= size
+        _stats["evictions"] += 1
+
+
+def clear():
+    """Delete every cached file. Counters are kept."""
+    global _size
+    with _lock:
+        for _, _, path in _entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _size = 0
+
+
+def get_stats():
+    """Return hit/miss/store/eviction counters plus the number and size of cached files."""
+    entries = _entries()
+    with _lock:
+        stats = dict(_stats)
+    stats["entries"] = len(entries)
+    stats["megabytes"] = round(sum(size for _, size, _ in entries) / (1024 * 1024), 2)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
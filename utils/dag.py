@@ -0,0 +1,100 @@
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# A stage listing this input receives a progress(payload) callable instead of a value
+PROGRESS = "progress"
+_PROGRESS_POLL = 0.1  # Seconds between progress checks while stages run
+
+
+class Stage:
+    """One pipeline step: fn(**inputs) produces the values named in outputs.
+
+    With a single output the return value is stored as-is; with several, fn
+    must return a tuple of the same length.
+    """
+
+    def __init__(self, name, fn, inputs=(), outputs=None, label=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs else (name,)
+        self.label = label or name
+
+
+def run_dag(stages, inputs=None, max_workers=None, on_start=None, on_done=None, on_progress=None):
+    """Run stages on a thread pool, each as soon as all of its inputs exist.
+
+    Returns (values, timings) where values holds the initial inputs plus every
+    stage output and timings maps stage name -> {"start", "duration"} in
+    seconds relative to the start of the run. on_start(stage),
+    on_done(stage, seconds) and on_progress(stage, payload) are called from
+    the calling thread, so they may safely touch UI state. The first stage
+    error cancels pending stages and is re-raised.
+    """
+    values = dict(inputs or {})
+    producers = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producers or out in values:
+                raise ValueError(f"Output {out!r} is produced more than once")
+            producers[out] = stage
+    for stage in stages:
+        missing = [i for i in stage.inputs if i not in producers and i not in values and i != PROGRESS]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} needs unknown inputs: {missing}")
+
+    timings = {}
+    remaining = list(stages)
+    running = {}
+    progress_events = queue.Queue()
+    t0 = time.monotonic()
+
+    def report_progress():
+        while not progress_events.empty():
+            stage, payload = progress_events.get()
+            if on_progress:
+                on_progress(stage, payload)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(stages)))
+    failed = False
+    try:
+        while remaining or running:
+            for stage in [s for s in remaining if all(i in values or i == PROGRESS for i in s.inputs)]:
+                remaining.remove(stage)
+                if on_start:
+                    on_start(stage)
+                kwargs = {i: values[i] for i in stage.inputs if i != PROGRESS}
+                if PROGRESS in stage.inputs:
+                    kwargs[PROGRESS] = lambda payload, stage=stage: progress_events.put((stage, payload))
+                running[executor.submit(_timed, stage.fn, kwargs)] = stage
+            if not running:
+                names = [s.name for s in remaining]
+                raise ValueError(f"Stages can never run (dependency cycle?): {names}")
+
+            done, _ = wait(running, timeout=_PROGRESS_POLL if on_progress else None, return_when=FIRST_COMPLETED)
+            report_progress()
+            for future in done:
+                stage = running.pop(future)
+                result, started, duration = future.result()
+                timings[stage.name] = {"start": round(started - t0, 3), "duration": round(duration, 3)}
+                if len(stage.outputs) == 1:
+                    values[stage.outputs[0]] = result
+                else:
+                    values.update(zip(stage.outputs, result))
+                if on_done:
+                    on_done(stage, duration)
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        # On failure, don't block on stages still running (e.g. a 30s generation)
+        executor.shutdown(wait=not failed, cancel_futures=True)
+
+    return values, timings
+
+
+def _timed(fn, kwargs):
+    started = time.monotonic()
+    result = fn(**kwargs)
+    return result, started, time.monotonic() - started
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# os.umask can only be read by setting it, so do that once at import rather than racing other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Hold an advisory inter-process lock on `path + ".lock"`.
+
+    Yields True once the lock is held. With blocking=False, yields False
+    immediately if another process holds it.
+    """
+    lock_path = os.path.abspath(path) + ".lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    acquired = False
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            acquired = True
+        except OSError:
+            if blocking:
+                raise
+        yield acquired
+    finally:
+        if acquired:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+
+
+def atomic_write_text(path, text):
+    """Write text to a temp file beside `path`, then rename it over `path`.
+
+    Readers see either the old or the new file, never a partial one.
+    """
+    _atomic_write(path, text, "w")
+
+
+def atomic_write_bytes(path, data):
+    """Binary counterpart of atomic_write_text."""
+    _atomic_write(path, data, "wb")
+
+
+def _atomic_write(path, data, mode):
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 files; keep the target readable like a plain open() would
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, _file_mode(path))
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_mode(path):
+    """Mode for a rewritten file: the existing file's, else 0666 minus the umask."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Serialize data as JSON and write it atomically to `path`."""
+    atomic_write_text(path, json.dumps(data, **dump_kwargs))
@@ -0,0 +1,66 @@
+import io
+import os
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))  # Longest side sent to the vision model, px
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+_DHASH_MASK = (1 << 128) - 1
+_COLOUR_TOLERANCE = 24  # Max per-channel difference in mean colour (0-255) for a near-duplicate
+
+
+def prepare_image(image_bytes):
+    """Shrink an upload for vision analysis. Returns (jpeg_bytes, phash).
+
+    Applies the EXIF orientation, flattens transparency onto white, fits the
+    image inside IMAGE_MAX_EDGE and re-encodes it as a JPEG without metadata.
+    A 4-12 MB phone photo typically comes out at 100-200 KB.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # Let the JPEG decoder downscale by 1/2-1/8 while decoding, much cheaper than a full decode
+    image.draft("RGB", (IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+    image = ImageOps.exif_transpose(image)  # Bake in rotation before EXIF is dropped
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return out.getvalue(), perceptual_hash(image)
+
+
+def perceptual_hash(image):
+    """Perceptual hash that survives resizing, re-encoding and small edits.
+
+    Low 128 bits are horizontal and vertical difference hashes of the
+    grayscale image; the 24 bits above hold the mean RGB colour, so flat or
+    dark images of different colours don't collide.
+    """
+    gray = image.convert("L")
+    wide = gray.resize((9, 8), Image.Resampling.LANCZOS).tobytes()  # One byte per pixel in mode "L"
+    tall = gray.resize((8, 9), Image.Resampling.LANCZOS).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (wide[row * 9 + col] > wide[row * 9 + col + 1])
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (tall[row * 8 + col] > tall[(row + 1) * 8 + col])
+    r, g, b = image.convert("RGB").resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    return ((r << 16 | g << 8 | b) << 128) | bits
+
+
+def hash_distance(a, b):
+    """Number of differing difference-hash bits, or 128 if the mean colours are far apart."""
+    colour_a, colour_b = a >> 128, b >> 128
+    for shift in (16, 8, 0):
+        if abs((colour_a >> shift & 0xFF) - (colour_b >> shift & 0xFF)) > _COLOUR_TOLERANCE:
+            return 128
+    return bin((a ^ b) & _DHASH_MASK).count("1")
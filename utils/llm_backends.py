@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# LLM_BACKEND selects what utils.llm_client talks to:
+# - "gemini" (default): Google Gemini via google-genai.
+# - "fake": a deterministic local stand-in returning schema-valid responses for
+#   every call site, with injectable latency and errors. No network or API key
+#   needed, so the pipeline can be benchmarked and load-tested offline.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.0"))  # Mean seconds per call
+FAKE_LATENCY_JITTER = float(os.getenv("LLM_FAKE_LATENCY_JITTER", "0.0"))  # +/- seconds, uniform
+FAKE_TAIL_RATE = float(os.getenv("LLM_FAKE_TAIL_RATE", "0.0"))  # Fraction of calls that are slow
+FAKE_TAIL_LATENCY = float(os.getenv("LLM_FAKE_TAIL_LATENCY", "5.0"))  # Seconds added to slow calls
+FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0.0"))  # Fraction raising a 503
+FAKE_BAD_JSON_RATE = float(os.getenv("LLM_FAKE_BAD_JSON_RATE", "0.0"))  # Fraction returning broken JSON
+
+
+# Backends return (text, usage): usage is {"prompt_tokens", "response_tokens"}
+# as counted by the provider, or None when it reports none (utils.llm_metrics
+# then estimates tokens from characters).
+
+
+class GeminiBackend:
+    """Google Gemini through the google-genai client."""
+
+    def __init__(self, model=GEMINI_MODEL):
+        self.model = model
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google import genai
+
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("GEMINI_API_KEY not set in .env")
+            self._client = genai.Client(api_key=api_key)
+        return self._client
+
+    def generate(self, contents):
+        response = self._get_client().models.generate_content(
+            model=self.model,
+            contents=contents,
+        )
+        return response.text, _gemini_usage(response)
+
+    async def generate_async(self, contents):
+        # client.aio shares the same client object, so calls reuse its connection pool
+        response = await self._get_client().aio.models.generate_content(
+            model=self.model,
+            contents=contents,
+        )
+        return response.text, _gemini_usage(response)
+
+
+def _gemini_usage(response):
+    """Exact token counts from a response's usage_metadata, or None if it has none."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None or usage.prompt_token_count is None:
+        return None
+    return {"prompt_tokens": usage.prompt_token_count, "response_tokens": usage.candidates_token_count or 0}
+
+
+class FakeBackendError(Exception):
+    """Injected transient failure; carries a retryable HTTP status."""
+
+    code = 503
+
+
+_MOODS = [
+    "happy", "sad", "calm", "anxious", "excited", "nostalgic", "angry",
+    "hopeful", "melancholic", "peaceful", "grateful", "lonely",
+]
+_INSTRUMENTS = ["piano", "strings", "acoustic guitar", "synth pads", "brass", "soft drums"]
+
+
+class FakeBackend:
+    """Deterministic offline backend: the same prompt always yields the same reply."""
+
+    model = "fake"
+
+    def __init__(self, latency=None, jitter=None, error_rate=None, bad_json_rate=None,
+                 tail_rate=None, tail_latency=None, seed=None):
+        self.latency = FAKE_LATENCY if latency is None else latency
+        self.jitter = FAKE_LATENCY_JITTER if jitter is None else jitter
+        self.error_rate = FAKE_ERROR_RATE if error_rate is None else error_rate
+        self.bad_json_rate = FAKE_BAD_JSON_RATE if bad_json_rate is None else bad_json_rate
+        self.tail_rate = FAKE_TAIL_RATE if tail_rate is None else tail_rate
+        self.tail_latency = FAKE_TAIL_LATENCY if tail_latency is None else tail_latency
+        self._rng = random.Random(seed)  # Drives injected faults only, not content
+
+    def _delay(self):
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if self._rng.random() < self.tail_rate:
+            delay += self.tail_latency
+        return max(0.0, delay)
+
+    def _respond(self, contents):
+        if self._rng.random() < self.error_rate:
+            raise FakeBackendError("Injected 503 from fake backend")
+        prompt = contents if isinstance(contents, str) else next(
+            (c for c in contents if isinstance(c, str)), ""
+        )
+        reply = _fake_reply(prompt)
+        if self._rng.random() < self.bad_json_rate and not isinstance(reply, str):
+            return "Here you go: {" + json.dumps(reply)[1:-1] + ",,"
+        return reply if isinstance(reply, str) else json.dumps(reply)
+
+    def generate(self, contents):
+        time.sleep(self._delay())
+        return self._respond(contents), None
+
+    async def generate_async(self, contents):
+        await asyncio.sleep(self._delay())
+        return self._respond(contents), None
+
+
+def _fake_reply(prompt):
+    """Return a plausible response object (or text) for the call site that built prompt."""
+    seed = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+
+    if "Analyze the following text" in prompt:
+        moods = _moods_for(_extract(prompt, r'(?s)Text: "(.*)"'), rng)
+        return {"summary": "A short reflection on how the writer feels", "moods": moods,
+                "mood": moods[0], "energy": round(rng.random(), 2)}
+    if "Analyze this image" in prompt:
+        moods = _moods_for("", rng)
+        return {"caption": "A scene with soft light and open space", "moods": moods,
+                "mood": moods[0], "energy": round(rng.random(), 2)}
+    if "spoken transcript" in prompt:
+        moods = _moods_for(_extract(prompt, r'(?s)Transcript: "(.*)"'), rng)
+        return {"moods": moods, "mood": moods[0], "energy": round(rng.random(), 2)}
+    if "multimodal emotion analyst" in prompt:
+        sources = [s.strip() for s in _extract(prompt, r"Inputs provided: (.*)").split(",") if s.strip()]
+        user_text = " ".join(re.findall(r'(?s)(?:Text the user wrote|Transcript of what the user said): "(.*?)"\n', prompt))
+        moods = _moods_for(user_text, rng)
+        per_source = {}
+        for source in sources:
+            mood = {"moods": moods, "mood": moods[0], "energy": round(rng.random(), 2)}
+            if source == "text":
+                mood["summary"] = "A short reflection on how the writer feels"
+            if source == "image":
+                mood["caption"] = "A scene with soft light and open space"
+            per_source[source] = mood
+        return {"per_source": per_source, "emotions": moods, "emotion": moods[0],
+                **{k: rng.randint(0, 100) for k in ["energy", "style", "warmth", "arc"]}}
+    if "emotion analyst" in prompt:
+        moods = _moods_for(" ".join(re.findall(r"Moods: (\[.*?\])", prompt)), rng)
+        return {"emotions": moods, "emotion": moods[0],
+                **{k: rng.randint(0, 100) for k in ["energy", "style", "warmth", "arc"]}}
+    if "music director" in prompt:
+        mood = _extract(prompt, r"- Emotion: (.*)") or "gentle"
+        a, b = rng.sample(_INSTRUMENTS, 2)
+        return (f"A {mood} piece led by {a} with {b} underneath, "
+                f"around {rng.choice([70, 90, 110, 130])} BPM, building gently toward a warm resolution.")
+    if "explaining to a user" in prompt:
+        mood = _extract(prompt, r"Detected emotion: (.*)") or "calm"
+        return {"narrative": f"Your input felt {mood}, so the music leans into that mood.",
+                "key_descriptors": rng.sample(_INSTRUMENTS, 2) + ["steady tempo", "warm tone"]}
+    if "music AI trainer" in prompt:
+        return {"positive": ["Name 2-3 specific instruments", "State a tempo in BPM"],
+                "negative": ["Avoid looping or unchanging language", "Avoid vague genre labels"]}
+    if "Analyze feedback for the emotion" in prompt:
+        ranges = {}
+        for key in ["energy", "style", "warmth", "arc"]:
+            lo = rng.randint(0, 70)
+            ranges[f"{key}_range"] = [lo, lo + rng.randint(10, 30)]
+        return {"preferred_params": ranges,
+                "prompt_principles": ["Name specific instruments"],
+                "anti_patterns": ["Avoid conflicting descriptors"],
+                "best_prompt_template": "A {tempo} {instrument} melody with {texture}"}
+    return {"text": "ok"}
+
+
+def _extract(prompt, pattern):
+    """Return the first capture group of pattern in prompt, or ""."""
+    match = re.search(pattern, prompt)
+    return match.group(1).strip() if match else ""
+
+
+def _moods_for(text, rng):
+    """Pick 1-3 moods, preferring mood words that appear in the user's text."""
+    words = set(re.findall(r"[a-z]+", text.lower()))
+    found = [m for m in _MOODS if m in words]
+    if found:
+        return found[:3]
+    return rng.sample(_MOODS, rng.randint(1, 3))
+
+
+def make_backend(name=None):
+    """Build the backend named by `name` or LLM_BACKEND."""
+    name = (name or LLM_BACKEND).lower()
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {name!r} (expected 'gemini' or 'fake')")
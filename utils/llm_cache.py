@@ -0,0 +1,138 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "llm_cache.sqlite3"),
+)
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))  # on disk
+CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))  # in-memory LRU
+
+_memory = OrderedDict()  # key -> (created, text)
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+
+def cache_key(model, prompt, image_bytes=None):
+    """Hash (model, prompt, image) into a cache key."""
+    h = hashlib.sha256()
+    h.update(model.encode())
+    h.update(b"\0")
+    h.update(hashlib.sha256(prompt.encode()).digest())
+    h.update(b"\0")
+    if image_bytes is not None:
+        h.update(hashlib.sha256(image_bytes).digest())
+    return h.hexdigest()
+
+
+@contextmanager
+def _connect():
+    """Open the disk store, yield it inside a transaction, then close it."""
+    path = os.path.abspath(CACHE_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def _remember(key, created, text):
+    """Insert into the in-memory LRU, evicting the least recently used entry."""
+    _memory[key] = (created, text)
+    _memory.move_to_end(key)
+    while len(_memory) > CACHE_MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def get(key):
+    """Return the cached response text for key, or None on a miss or expiry."""
+    if not CACHE_ENABLED or key is None:
+        return None
+    now = time.time()
+    with _lock:
+        hit = _memory.get(key)
+        if hit and now - hit[0] <= CACHE_TTL:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return hit[1]
+        _memory.pop(key, None)
+
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT text, created FROM responses WHERE key = ? AND created >= ?",
+                (key, now - CACHE_TTL),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+    except sqlite3.Error:
+        row = None  # A broken disk cache degrades to a miss
+
+    with _lock:
+        if row:
+            _remember(key, row[1], row[0])
+            _stats["disk_hits"] += 1
+            return row[0]
+        _stats["misses"] += 1
+    return None
+
+
+def put(key, text):
+    """Store a response in memory and on disk, then enforce TTL and size limits."""
+    if not CACHE_ENABLED or key is None:
+        return
+    now = time.time()
+    with _lock:
+        _remember(key, now, text)
+        _stats["stores"] += 1
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, text, now, now),
+            )
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - CACHE_TTL,))
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                (CACHE_MAX_ENTRIES,),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def clear():
+    """Drop every cached response (memory and disk). Counters are kept."""
+    with _lock:
+        _memory.clear()
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM responses")
+    except sqlite3.Error:
+        pass
+
+
+def get_stats():
+    """Return hit/miss counters plus the current in-memory size."""
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+    return stats
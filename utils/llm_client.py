@@ -1,33 +1,100 @@
+import asyncio
 import io
 import os
-import json
+import weakref
 from dotenv import load_dotenv
-from google import genai
 from PIL import Image
+from utils import llm_cache, llm_metrics
+from utils.llm_backends import make_backend
+from utils.llm_resilience import (
+    LLM_JSON_REASKS,
+    call_with_retries,
+    call_with_retries_async,
+    deadline_after,
+    repair_json,
+)
 
 load_dotenv()
 
-_client = None
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # Max in-flight async calls per event loop
 
+_backend = None
 
-def _get_client():
-    global _client
-    if _client is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise RuntimeError("GEMINI_API_KEY not set in .env")
-        _client = genai.Client(api_key=api_key)
-    return _client
 
+def _get_backend():
+    """Return the process-wide backend selected by LLM_BACKEND."""
+    global _backend
+    if _backend is None:
+        _backend = make_backend()
+    return _backend
 
-def ask_json(prompt):
-    """Send a prompt to Gemini and parse the JSON response."""
-    client = _get_client()
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
-    return json.loads(_strip_json_fences(response.text))
+
+def set_backend(backend):
+    """Swap the backend (e.g. a FakeBackend with custom latency) for this process."""
+    global _backend
+    _backend = backend
+
+
+_REASK_SUFFIX = "\n\nYour previous reply was not valid JSON. Reply with ONLY the JSON, no other text."
+
+
+def _generate(contents, call, deadline=None):
+    """Call the backend and return the raw response text.
+
+    Each call gets jittered retries on transient failures and an optional
+    hedged duplicate request, all before deadline (default LLM_TIMEOUT from
+    now; see utils.llm_resilience). Sizes, token usage and retries are
+    counted on call (a utils.llm_metrics.CallMetrics).
+    """
+    backend = _get_backend()
+    call.prompt(contents)
+    text, usage = call_with_retries(lambda: backend.generate(contents), on_retry=call.retry, deadline=deadline)
+    call.response(contents, text, usage)
+    return text
+
+
+def _parse_json(text):
+    return repair_json(_strip_json_fences(text))
+
+
+# Responses are cached by (model, prompt, image) in utils.llm_cache. Fresh
+# text is stored only after it parses, so malformed responses never stick.
+# Every request is recorded in utils.llm_metrics under its call site.
+
+def _ask_json_contents(build_contents, key, site):
+    """Shared JSON path: cache lookup, generate, repair, and re-ask on bad JSON.
+
+    build_contents(suffix) returns the request contents with suffix appended
+    to the prompt text.
+    """
+    text = llm_cache.get(key)
+    if text is not None:
+        llm_metrics.record_cache_hit(site)
+        return _parse_json(text)
+    with llm_metrics.track(site) as call:
+        deadline = deadline_after()  # Shared by the first request and any re-asks
+        text = _generate(build_contents(""), call, deadline)
+        for attempt in range(LLM_JSON_REASKS + 1):
+            try:
+                result = _parse_json(text)
+            except ValueError:
+                call.parse_failure()
+                if attempt == LLM_JSON_REASKS:
+                    raise
+                text = _generate(build_contents(_REASK_SUFFIX), call, deadline)
+                continue
+            llm_cache.put(key, text)
+            return result
+
+
+def ask_json(prompt, cache=True):
+    """Send a prompt to Gemini and parse the JSON response.
+
+    Pass cache=False for call sites that need a fresh answer every time.
+    """
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt) if cache else None
+    return _ask_json_contents(lambda suffix: prompt + suffix, key, site)
 
 
 def _strip_json_fences(text):
@@ -41,22 +108,130 @@ def _strip_json_fences(text):
     return text
 
 
-def ask_json_with_image(prompt, image_bytes):
+def ask_json_with_image(prompt, image_bytes, cache=True):
     """Send a prompt + image to Gemini and parse the JSON response."""
-    client = _get_client()
-    image = Image.open(io.BytesIO(image_bytes))
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[prompt, image],
-    )
-    return json.loads(_strip_json_fences(response.text))
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt, image_bytes) if cache else None
+    image = None
+
+    def build_contents(suffix):
+        nonlocal image
+        if image is None:
+            image = Image.open(io.BytesIO(image_bytes))
+        return [prompt + suffix, image]
+
+    return _ask_json_contents(build_contents, key, site)
 
 
-def ask_text(prompt):
+def ask_text(prompt, cache=True):
     """Send a prompt to Gemini and return raw text response."""
-    client = _get_client()
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
-    return response.text.strip()
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt) if cache else None
+    text = llm_cache.get(key)
+    if text is not None:
+        llm_metrics.record_cache_hit(site)
+    else:
+        with llm_metrics.track(site) as call:
+            text = _generate(prompt, call)
+        llm_cache.put(key, text)
+    return text.strip()
+
+
+def get_cache_stats():
+    """Return response-cache hit/miss counters."""
+    return llm_cache.get_stats()
+
+
+def get_llm_metrics():
+    """Return per-call-site latency, size, retry and error metrics (see utils.llm_metrics)."""
+    return llm_metrics.get_metrics()
+
+
+# --- Async API ---
+#
+# Coroutine twins of the ask_* functions. They share the process-wide backend
+# (for Gemini, one client and its keep-alive connection pool), so many
+# concurrent sessions or reflection calls don't each need an OS thread.
+# LLM_MAX_CONCURRENCY caps in-flight requests per event loop.
+
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def _generate_async(contents, call, deadline=None):
+    """Async _generate: same deadline/retry/hedge policy, bounded by the semaphore."""
+    backend = _get_backend()
+    call.prompt(contents)
+    deadline = deadline_after() if deadline is None else deadline  # Time queued on the semaphore counts
+    async with _get_semaphore():
+        text, usage = await call_with_retries_async(
+            lambda: backend.generate_async(contents), on_retry=call.retry, deadline=deadline
+        )
+    call.response(contents, text, usage)
+    return text
+
+
+async def _ask_json_contents_async(build_contents, key, site):
+    """Async twin of _ask_json_contents."""
+    text = await asyncio.to_thread(llm_cache.get, key)
+    if text is not None:
+        llm_metrics.record_cache_hit(site)
+        return _parse_json(text)
+    with llm_metrics.track(site) as call:
+        deadline = deadline_after()
+        text = await _generate_async(build_contents(""), call, deadline)
+        for attempt in range(LLM_JSON_REASKS + 1):
+            try:
+                result = _parse_json(text)
+            except ValueError:
+                call.parse_failure()
+                if attempt == LLM_JSON_REASKS:
+                    raise
+                text = await _generate_async(build_contents(_REASK_SUFFIX), call, deadline)
+                continue
+            await asyncio.to_thread(llm_cache.put, key, text)
+            return result
+
+
+async def ask_json_async(prompt, cache=True):
+    """Async ask_json."""
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt) if cache else None
+    return await _ask_json_contents_async(lambda suffix: prompt + suffix, key, site)
+
+
+async def ask_json_with_image_async(prompt, image_bytes, cache=True):
+    """Async ask_json_with_image."""
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt, image_bytes) if cache else None
+    image = None
+
+    def build_contents(suffix):
+        nonlocal image
+        if image is None:
+            image = Image.open(io.BytesIO(image_bytes))
+        return [prompt + suffix, image]
+
+    return await _ask_json_contents_async(build_contents, key, site)
+
+
+async def ask_text_async(prompt, cache=True):
+    """Async ask_text."""
+    site = llm_metrics.call_site()
+    key = llm_cache.cache_key(_get_backend().model, prompt) if cache else None
+    text = await asyncio.to_thread(llm_cache.get, key)
+    if text is not None:
+        llm_metrics.record_cache_hit(site)
+    else:
+        with llm_metrics.track(site) as call:
+            text = await _generate_async(prompt, call)
+        await asyncio.to_thread(llm_cache.put, key, text)
+    return text.strip()
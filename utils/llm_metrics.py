@@ -0,0 +1,212 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from utils.file_io import atomic_write_json, atomic_write_text
+
+load_dotenv()
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+METRICS_JSON_PATH = os.getenv("LLM_METRICS_JSON_PATH", os.path.join(_DATA_DIR, "llm_metrics.json"))
+METRICS_PROM_PATH = os.getenv("LLM_METRICS_PROM_PATH", os.path.join(_DATA_DIR, "llm_metrics.prom"))
+METRICS_EXPORT_INTERVAL = float(os.getenv("LLM_METRICS_EXPORT_INTERVAL", "0"))  # Seconds; 0 = only on export_metrics()
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)  # Seconds, upper bounds
+_CHARS_PER_TOKEN = 4  # Rough estimate for backends that don't report token usage
+
+_COUNTERS = ("calls", "cache_hits", "errors", "retries", "parse_failures",
+             "prompt_chars", "response_chars", "prompt_tokens", "response_tokens")
+
+_sites = {}  # call site -> {counter: value, "latency_sum", "latency_buckets", "error_types"}
+_lock = threading.Lock()
+_last_export = 0.0
+
+
+def call_site():
+    """Name the code that called into the LLM client, e.g. "text_analyzer.analyze_text_llm"."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(("utils.llm_", "asyncio")):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    module = frame.f_globals.get("__name__", "?").rsplit(".", 1)[-1]
+    return f"{module}.{frame.f_code.co_name}"
+
+
+def _site(name):
+    """Return the (lock-held) metrics dict for a call site, creating it on first use."""
+    site = _sites.get(name)
+    if site is None:
+        site = {c: 0 for c in _COUNTERS}
+        site.update(latency_sum=0.0, latency_buckets=[0] * (len(LATENCY_BUCKETS) + 1), error_types={})
+        _sites[name] = site
+    return site
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "".join(c for c in contents if isinstance(c, str))
+
+
+class CallMetrics:
+    """Counters for one in-flight LLM request; see track()."""
+
+    def __init__(self, site):
+        self.site = site
+
+    def prompt(self, contents):
+        """Count a request sent to the backend (the first one or a re-ask)."""
+        self._add(prompt_chars=len(_prompt_text(contents)))
+
+    def response(self, contents, text, usage=None):
+        """Count a reply to contents, with the backend's token usage if it reported any."""
+        chars = len(text or "")
+        if usage is None:
+            usage = {"prompt_tokens": len(_prompt_text(contents)) // _CHARS_PER_TOKEN,
+                     "response_tokens": chars // _CHARS_PER_TOKEN}
+        self._add(response_chars=chars, prompt_tokens=usage["prompt_tokens"],
+                  response_tokens=usage["response_tokens"])
+
+    def retry(self, attempt=None, error=None):
+        self._add(retries=1)
+
+    def parse_failure(self):
+        self._add(parse_failures=1)
+
+    def _add(self, **counts):
+        with _lock:
+            site = _site(self.site)
+            for key, value in counts.items():
+                site[key] += value
+
+
+def record_cache_hit(site):
+    with _lock:
+        _site(site)["cache_hits"] += 1
+
+
+@contextmanager
+def track(site):
+    """Time one LLM request (including retries and re-asks) for a call site.
+
+    Yields a CallMetrics for counting prompts, responses, retries and parse
+    failures; an exception leaving the block is counted as an error.
+    """
+    call = CallMetrics(site)
+    start = time.monotonic()
+    try:
+        yield call
+    except BaseException as e:
+        _finish(site, time.monotonic() - start, type(e).__name__)
+        raise
+    _finish(site, time.monotonic() - start, None)
+
+
+def _finish(name, seconds, error_type):
+    with _lock:
+        site = _site(name)
+        site["calls"] += 1
+        site["latency_sum"] += seconds
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        site["latency_buckets"][bucket] += 1
+        if error_type:
+            site["errors"] += 1
+            site["error_types"][error_type] = site["error_types"].get(error_type, 0) + 1
+    if METRICS_EXPORT_INTERVAL > 0 and time.monotonic() - _last_export >= METRICS_EXPORT_INTERVAL:
+        try:
+            export_metrics()
+        except OSError:
+            pass  # Metrics must never fail an LLM call
+
+
+def _percentile(buckets, count, p):
+    """Upper bound of the histogram bucket holding the p-th fraction of calls (None past the last bound)."""
+    target = count * p
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS, buckets):
+        seen += n
+        if seen >= target:
+            return bound
+    return None
+
+
+def get_metrics():
+    """Return a JSON-serializable snapshot of per-call-site metrics.
+
+    Latency covers backend calls only (cache hits are counted separately),
+    including retries and JSON re-asks; p50/p95 are histogram bucket bounds.
+    Token counts are the backend's own where it reports them (Gemini),
+    otherwise estimated from characters.
+    """
+    with _lock:
+        sites = {
+            name: dict(site, latency_buckets=list(site["latency_buckets"]), error_types=dict(site["error_types"]))
+            for name, site in _sites.items()
+        }
+    for site in sites.values():
+        count = site["calls"]
+        site["latency_avg"] = round(site["latency_sum"] / count, 3) if count else 0.0
+        site["latency_p50"] = _percentile(site["latency_buckets"], count, 0.50) if count else 0.0
+        site["latency_p95"] = _percentile(site["latency_buckets"], count, 0.95) if count else 0.0
+        site["latency_sum"] = round(site["latency_sum"], 3)
+        site["latency_buckets"] = dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], site["latency_buckets"]))
+    return {"generated_at": time.time(), "latency_buckets": list(LATENCY_BUCKETS), "sites": sites}
+
+
+def to_prometheus(snapshot=None):
+    """Render a snapshot in the Prometheus text exposition format."""
+    snapshot = snapshot or get_metrics()
+    sites = snapshot["sites"]
+    lines = []
+
+    def counter(metric, key, help_text):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, site in sorted(sites.items()):
+            lines.append(f'{metric}{{site="{name}"}} {site[key]}')
+
+    counter("llm_calls_total", "calls", "LLM requests that reached the backend.")
+    counter("llm_cache_hits_total", "cache_hits", "LLM requests answered from the response cache.")
+    counter("llm_errors_total", "errors", "LLM requests that failed after retries.")
+    counter("llm_retries_total", "retries", "Retried backend attempts.")
+    counter("llm_parse_failures_total", "parse_failures", "Responses that could not be parsed as JSON.")
+    counter("llm_prompt_chars_total", "prompt_chars", "Characters sent in prompts.")
+    counter("llm_response_chars_total", "response_chars", "Characters received in responses.")
+    counter("llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens (estimated if the backend reports none).")
+    counter("llm_response_tokens_total", "response_tokens", "Response tokens (estimated if the backend reports none).")
+
+    lines.append("# HELP llm_request_seconds LLM request latency including retries and re-asks.")
+    lines.append("# TYPE llm_request_seconds histogram")
+    for name, site in sorted(sites.items()):
+        cumulative = 0
+        for bound, n in site["latency_buckets"].items():
+            cumulative += n
+            lines.append(f'llm_request_seconds_bucket{{site="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'llm_request_seconds_sum{{site="{name}"}} {site["latency_sum"]}')
+        lines.append(f'llm_request_seconds_count{{site="{name}"}} {site["calls"]}')
+
+    lines.append("# HELP llm_errors_by_type_total Failed LLM requests by exception type.")
+    lines.append("# TYPE llm_errors_by_type_total counter")
+    for name, site in sorted(sites.items()):
+        for error_type, n in sorted(site["error_types"].items()):
+            lines.append(f'llm_errors_by_type_total{{site="{name}",type="{error_type}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(json_path=None, prom_path=None):
+    """Write the JSON snapshot and the Prometheus text file (e.g. for node_exporter's textfile collector)."""
+    global _last_export
+    _last_export = time.monotonic()
+    snapshot = get_metrics()
+    atomic_write_json(json_path or METRICS_JSON_PATH, snapshot, indent=2)
+    atomic_write_text(prom_path or METRICS_PROM_PATH, to_prometheus(snapshot))
+    return snapshot
+
+
+def reset_metrics():
+    """Forget all recorded metrics."""
+    with _lock:
+        _sites.clear()
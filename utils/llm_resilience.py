@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # Deadline per call, covering retries and re-asks, seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # Retries after the first attempt
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))  # First backoff, seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"  # Send a second request when the first is slow
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # Fixed hedge delay; 0 = use observed p95
+LLM_JSON_REASKS = int(os.getenv("LLM_JSON_REASKS", "1"))  # Re-asks after unrepairable JSON
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_HEDGE_MIN_SAMPLES = 20
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-call")
+_latencies = deque(maxlen=200)
+_latency_lock = threading.Lock()
+
+
+class LLMTimeoutError(TimeoutError):
+    """An LLM call did not finish within its deadline."""
+
+
+def is_retryable(exc):
+    """True for timeouts, connection failures and retryable HTTP statuses."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return status in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _record_latency(seconds):
+    with _latency_lock:
+        _latencies.append(seconds)
+
+
+def latency_p95():
+    """Return the p95 of recent successful call latencies, or None with too few samples."""
+    with _latency_lock:
+        samples = sorted(_latencies)
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def _hedge_delay():
+    if not LLM_HEDGE:
+        return None
+    if LLM_HEDGE_AFTER > 0:
+        return LLM_HEDGE_AFTER
+    return latency_p95()
+
+
+def deadline_after(timeout=None):
+    """Return a time.monotonic() deadline timeout seconds from now (default LLM_TIMEOUT)."""
+    return time.monotonic() + (LLM_TIMEOUT if timeout is None else timeout)
+
+
+def _call_once(fn, timeout):
+    """Run fn() with a deadline, hedging with a second fn() if the first is slow.
+
+    A timed-out fn() can't be interrupted: its thread keeps running (and
+    occupies an _executor worker) until the backend returns, and the result
+    is dropped.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    futures = [_executor.submit(fn)]
+    hedge_after = _hedge_delay()
+    if hedge_after is not None and hedge_after < timeout:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            futures.append(_executor.submit(fn))
+
+    error = None
+    pending = set(futures)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                _record_latency(time.monotonic() - start)
+                return future.result()
+            error = future.exception()
+    if pending:
+        for other in pending:
+            other.cancel()  # Threads already running can't be stopped; their result is dropped
+        raise LLMTimeoutError(f"LLM call hit its deadline ({timeout:.1f}s left for this attempt)")
+    raise error
+
+
+def _next_delay(attempt, error, max_retries, deadline):
+    """Backoff before the next retry, or None if error should be raised (not retryable or out of time)."""
+    if attempt >= max_retries or not is_retryable(error):
+        return None
+    delay = backoff_delay(attempt)
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def call_with_retries(fn, timeout=None, max_retries=None, on_retry=None, deadline=None):
+    """Call fn() with optional hedging and jittered retries, all within one deadline.
+
+    The deadline (a time.monotonic() value; default: timeout or LLM_TIMEOUT
+    seconds from now) bounds every attempt and backoff sleep together; pass
+    the same deadline to related calls, such as a JSON re-ask, to share it.
+    Only retryable failures (see is_retryable) are retried; anything else is
+    raised immediately. on_retry(attempt, error) is called before each retry.
+    Attempts abandoned at the deadline keep running in the background.
+    """
+    deadline = deadline_after(timeout) if deadline is None else deadline
+    max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM call hit its deadline before the attempt started")
+        try:
+            return _call_once(fn, remaining)
+        except Exception as e:
+            delay = _next_delay(attempt, e, max_retries, deadline)
+            if delay is None:
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(delay)
+            attempt += 1
+
+
+async def _call_once_async(coro_fn, timeout):
+    """Async twin of _call_once: deadline plus optional hedged duplicate."""
+    start = time.monotonic()
+    tasks = [asyncio.ensure_future(coro_fn())]
+    hedge_after = _hedge_delay()
+    try:
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(coro_fn()))
+
+        error = None
+        pending = set(tasks)
+        deadline = start + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError(f"LLM call hit its deadline ({timeout:.1f}s left for this attempt)")
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    _record_latency(time.monotonic() - start)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_with_retries_async(coro_fn, timeout=None, max_retries=None, on_retry=None, deadline=None):
+    """Async twin of call_with_retries; coro_fn() must return a new coroutine each call.
+
+    Timed-out attempts are cancelled rather than abandoned.
+    """
+    deadline = deadline_after(timeout) if deadline is None else deadline
+    max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM call hit its deadline before the attempt started")
+        try:
+            return await _call_once_async(coro_fn, remaining)
+        except Exception as e:
+            delay = _next_delay(attempt, e, max_retries, deadline)
+            if delay is None:
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def repair_json(text):
+    """Best-effort parse of almost-JSON model output. Raises ValueError if hopeless.
+
+    Tries, in order: the text as-is, the outermost {...}/[...] span, that span
+    without trailing commas, and finally with curly quotes straightened.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object or array in response")
+    candidate = text[min(starts):max(text.rfind("}"), text.rfind("]")) + 1]
+    no_trailing = re.sub(r",\s*([}\]])", r"\1", candidate)
+    straightened = no_trailing.replace("\u201c", '"').replace("\u201d", '"')
+    for attempt in (candidate, no_trailing, straightened):
+        try:
+            return json.loads(attempt)
+        except ValueError:
+            continue
+    raise ValueError("Could not repair JSON response")